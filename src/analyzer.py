@@ -0,0 +1,188 @@
+import asyncio
+import json
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+
+from solders.pubkey import Pubkey  # type: ignore
+
+import utils
+
+BASE58_ALPHABET: str = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+BASE58_CHARS: frozenset = frozenset(BASE58_ALPHABET)
+TOKEN_PATTERN: Pattern[str] = re.compile(
+    r"(?P<short>https?://t\.co/\S+?)[.,!?]*(?=\s|$)"
+    r"|(?P<pump>https://(?:www\.)?pump\.fun/(?P<mint>[A-Za-z0-9]+))"
+    r"|(?P<dex>https://(?:www\.)?dexscreener\.com/solana/(?P<pair>[A-Za-z0-9]+))"
+    r"|(?<![\w$])(?P<ticker>\$[A-Za-z][A-Za-z0-9]{0,9})\b"
+    r"|(?<![\w/])(?P<address>[1-9A-HJ-NP-Za-km-z]{32,44})(?!\w)"
+)
+
+
+def is_mint_address(value: str) -> bool:
+    """Check for a Solana address, rejecting wrong lengths and alphabets before decoding."""
+    if not 32 <= len(value) <= 44 or not BASE58_CHARS.issuperset(value):
+        return False
+    try:
+        Pubkey.from_string(value)
+        return True
+    except ValueError:
+        return False
+
+
+@dataclass
+class TextAnalysis:
+    short_urls: List[Tuple[int, int]] = field(default_factory=list)  # spans of t.co links
+    pump_urls: List[str] = field(default_factory=list)
+    pump_mints: List[str] = field(default_factory=list)
+    dex_pairs: List[str] = field(default_factory=list)
+    addresses: List[str] = field(default_factory=list)
+    tickers: List[str] = field(default_factory=list)
+
+    @property
+    def pump_url(self) -> Optional[str]:
+        return self.pump_urls[0] if self.pump_urls else None
+
+    @property
+    def pump_mint(self) -> Optional[str]:
+        return self.pump_mints[0] if self.pump_mints else None
+
+    def merge(self, other: "TextAnalysis") -> None:
+        self.pump_urls += [url for url in other.pump_urls if url not in self.pump_urls]
+        self.pump_mints += [mint for mint in other.pump_mints if mint not in self.pump_mints]
+        self.dex_pairs += [pair for pair in other.dex_pairs if pair not in self.dex_pairs]
+        self.addresses += [address for address in other.addresses if address not in self.addresses]
+        self.tickers += [ticker for ticker in other.tickers if ticker not in self.tickers]
+
+
+def _add_short(analysis: TextAnalysis, match: re.Match[str]) -> None:
+    analysis.short_urls.append(match.span("short"))
+
+
+def _add_pump(analysis: TextAnalysis, match: re.Match[str]) -> None:
+    mint = match.group("mint")
+    if is_mint_address(mint) and mint not in analysis.pump_mints:
+        analysis.pump_urls.append(match.group("pump"))
+        analysis.pump_mints.append(mint)
+
+
+def _add_dex(analysis: TextAnalysis, match: re.Match[str]) -> None:
+    if match.group("pair") not in analysis.dex_pairs:
+        analysis.dex_pairs.append(match.group("pair"))
+
+
+def _add_ticker(analysis: TextAnalysis, match: re.Match[str]) -> None:
+    if match.group("ticker") not in analysis.tickers:
+        analysis.tickers.append(match.group("ticker"))
+
+
+def _add_address(analysis: TextAnalysis, match: re.Match[str]) -> None:
+    address = match.group("address")
+    if is_mint_address(address) and address not in analysis.addresses:
+        analysis.addresses.append(address)
+
+
+# TOKEN_PATTERN group name -> how a match of that kind is recorded
+HANDLERS: Dict[str, Callable[[TextAnalysis, re.Match[str]], None]] = {
+    "short": _add_short,
+    "pump": _add_pump,
+    "dex": _add_dex,
+    "ticker": _add_ticker,
+    "address": _add_address,
+}
+
+
+def analyze(text: str) -> TextAnalysis:
+    """Extract links, contract addresses and tickers from a text in a single scan."""
+    analysis = TextAnalysis()
+    for match in TOKEN_PATTERN.finditer(text):
+        handler = HANDLERS.get(match.lastgroup or "")
+        if handler:
+            handler(analysis, match)
+    return analysis
+
+
+async def analyze_tweet(text: str) -> Tuple[str, TextAnalysis]:
+    """Analyze a tweet, expand its t.co links and analyze what they point to.
+
+    Returns the text with the short links replaced by their targets, which is what gets posted.
+    """
+    analysis = analyze(text)
+    if not analysis.short_urls:
+        return text, analysis
+
+    expanded = await asyncio.gather(*(utils.expand_url(text[start:end]) for start, end in analysis.short_urls))
+    parts: List[str] = []
+    position = 0
+    for (start, end), url in zip(analysis.short_urls, expanded):
+        parts += [text[position:start], url]
+        position = end
+    parts.append(text[position:])
+    analysis.merge(analyze(" ".join(expanded)))
+    return "".join(parts), analysis
+
+
+def _legacy_analyze(text: str) -> Dict[str, List[str]]:
+    """Run the previous per-call regex path, kept for the benchmark."""
+    short_urls = re.compile(r"(https?://t\.co/\S+?)([\.,!?]*)(?:\s|$)").findall(text)
+    pump_urls = []
+    match = re.compile(r"https:\/\/(www\.)?pump\.fun\/[A-Za-z0-9]+").search(text)
+    if match and utils.is_valid_pubkey(match.group(0).split("/")[-1]):
+        pump_urls.append(match.group(0))
+    dex_pairs = re.compile(r"https://(?:www\.)?dexscreener\.com/solana/([A-Za-z0-9]+)").findall(text)
+    tickers = re.compile(r"(?<![\w$])\$[A-Za-z][A-Za-z0-9]{0,9}\b").findall(text)
+    addresses = [word for word in text.split() if utils.is_valid_pubkey(word)]
+    return {
+        "short_urls": [url for url, _ in short_urls],
+        "pump_urls": pump_urls,
+        "dex_pairs": dex_pairs,
+        "tickers": tickers,
+        "addresses": addresses,
+    }
+
+
+async def _fetch_corpus() -> List[str]:
+    import aiohttp
+
+    import twitter
+
+    params = twitter.FETCH_PARAMS.copy()
+    params["query"] = twitter.PUMP_QUERY
+    async with aiohttp.ClientSession() as session:
+        async with session.get(twitter.URL, headers=twitter.HEADERS_MAIN, params=params) as response:
+            data = await response.json()
+    return [tweet["text"] for tweet in data.get("results", [])]
+
+
+def _load_corpus(path: str) -> List[str]:
+    texts = []
+    with open(path) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            texts.append(json.loads(line)["text"] if line.startswith("{") else line)
+    return texts
+
+
+def benchmark(texts: List[str], rounds: int = 200) -> None:
+    """Compare the single-pass analyzer with the previous per-call regex path over a tweet corpus."""
+    print(f"Corpus: {len(texts)} tweets, {sum(len(text) for text in texts)} characters")
+    for name, func in (("legacy", _legacy_analyze), ("analyzer", analyze)):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for text in texts:
+                func(text)
+        elapsed = time.perf_counter() - started
+        print(f"{name}: {elapsed / (rounds * len(texts)) * 1e6:.1f}us per tweet")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        corpus = _load_corpus(sys.argv[2]) if len(sys.argv) > 2 else asyncio.run(_fetch_corpus())
+        if corpus:
+            benchmark(corpus)
+        else:
+            print("Empty corpus.")
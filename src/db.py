@@ -1,20 +1,140 @@
 import asyncio
 import json
 import logging
+import sqlite3
 import sys
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from os import getenv
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar, Union
 
 from bson import json_util
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from pymongo.server_api import ServerApi
 
+from schemas import (
+    banned_schema,
+    checkpoints_schema,
+    drops_schema,
+    leases_schema,
+    mint_mentions_key,
+    mint_mentions_schema,
+    pool_subscriptions_schema,
+    score_requests_schema,
+    scrapper_tasks_schema,
+)
+
 load_dotenv()
 LOGGER: logging.Logger = logging.getLogger(__name__)
+STORAGE_BACKEND: str = getenv("STORAGE_BACKEND", "mongo")
+SQLITE_PATH: str = getenv("SQLITE_PATH", "xscrapper.db")
+
+T = TypeVar("T")
+
+
+class Storage(ABC):
+    """Storage interface shared by the Mongo and the embedded backends."""
+
+    @abstractmethod
+    async def initialize(self) -> None: ...
+
+    @abstractmethod
+    async def insert_banned(self, x_user_id: str) -> None: ...
+
+    @abstractmethod
+    async def insert_drop(self, x_user_id: str, x_username: str, post_id: Optional[str] = None) -> None: ...
+
+    @abstractmethod
+    async def update_drop_score(self, x_user_id: str, score: float) -> None: ...
+
+    @abstractmethod
+    async def update_drop_posts(self, x_user_id: str, post_id: str) -> None: ...
+
+    @abstractmethod
+    async def update_drop_messages(self, x_user_id: str, message_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_drop(self, x_user_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def delete_drop(self, x_user_id: str) -> None: ...
+
+    @abstractmethod
+    async def check_drop(self, x_user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def check_banned(self, x_user_id: str) -> bool: ...
+
+    @abstractmethod
+    async def get_drops(self, condition: Optional[dict], projection: Optional[dict]) -> list[dict]: ...
+
+    @abstractmethod
+    async def get_checkpoint(self, name: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def set_checkpoint(self, name: str, slot: int, signature: str, token: Optional[int] = None) -> bool:
+        """Move the checkpoint unless a holder of a newer fencing token already did, returning whether it moved."""
+
+    @abstractmethod
+    async def get_pool_subscriptions(self) -> list[dict]: ...
 
+    @abstractmethod
+    async def save_pool_subscription(self, subscription: dict) -> None: ...
 
-class MongoDB:
+    @abstractmethod
+    async def delete_pool_subscription(self, chat_id: int) -> None: ...
+
+    @abstractmethod
+    async def get_scrapper_tasks(self) -> list[dict]: ...
+
+    @abstractmethod
+    async def save_scrapper_task(self, task: dict) -> None: ...
+
+    @abstractmethod
+    async def delete_scrapper_task(self, chat_id: int) -> None: ...
+
+    @abstractmethod
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> Optional[int]:
+        """Take the lease if it is free, expired or already ours, returning its new fencing token."""
+
+    @abstractmethod
+    async def renew_lease(self, name: str, owner: str, token: int, ttl: int) -> bool: ...
+
+    @abstractmethod
+    async def release_lease(self, name: str, owner: str, token: int) -> None: ...
+
+    @abstractmethod
+    async def check_lease(self, name: str, owner: str, token: int) -> bool:
+        """Whether the lease is still held by `owner` under `token` and has not expired."""
+
+    @abstractmethod
+    async def save_mint_mention(self, mention: dict) -> None: ...
+
+    @abstractmethod
+    async def get_mint_mentions(self, since: int) -> list[dict]: ...
+
+    @abstractmethod
+    async def delete_mint_mentions(self, before: int) -> None: ...
+
+    @abstractmethod
+    async def request_score(self, x_username: str) -> None:
+        """Ask the replica holding the scoring lease for a fresh score, clearing any previous answer."""
+
+    @abstractmethod
+    async def get_score_request(self, x_username: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_pending_score_requests(self) -> list[dict]: ...
+
+    @abstractmethod
+    async def save_score(self, x_username: str, score: float) -> None: ...
+
+
+class MongoDB(Storage):
     def __init__(self):
         """Initialize MongoDB client."""
         self.MONGO_URI = getenv("MONGO_URI", "")
@@ -23,6 +143,12 @@ class MongoDB:
         self.db = None
         self.BANNED_COLLECTION = None
         self.DROPS_COLLECTION = None
+        self.CHECKPOINTS_COLLECTION = None
+        self.POOL_SUBSCRIPTIONS_COLLECTION = None
+        self.MINT_MENTIONS_COLLECTION = None
+        self.SCRAPPER_TASKS_COLLECTION = None
+        self.LEASES_COLLECTION = None
+        self.SCORE_REQUESTS_COLLECTION = None
 
     async def initialize(self) -> None:
         LOGGER.info("Connecting to MongoDB...")
@@ -30,8 +156,19 @@ class MongoDB:
         self.db = self.client[self.COLLECTION_NAME]
         self.BANNED_COLLECTION = self.db["banned"]
         self.DROPS_COLLECTION = self.db["drops"]
+        self.CHECKPOINTS_COLLECTION = self.db["checkpoints"]
+        self.POOL_SUBSCRIPTIONS_COLLECTION = self.db["pool_subscriptions"]
+        self.MINT_MENTIONS_COLLECTION = self.db["mint_mentions"]
+        self.SCRAPPER_TASKS_COLLECTION = self.db["scrapper_tasks"]
+        self.LEASES_COLLECTION = self.db["leases"]
+        self.SCORE_REQUESTS_COLLECTION = self.db["score_requests"]
 
         await self.check_db()
+        await self.CHECKPOINTS_COLLECTION.create_index("name", unique=True)
+        await self.LEASES_COLLECTION.create_index("name", unique=True)
+        await self.MINT_MENTIONS_COLLECTION.create_index([(field, 1) for field in mint_mentions_key], unique=True)
+        await self.MINT_MENTIONS_COLLECTION.create_index("timestamp")
+        await self.SCORE_REQUESTS_COLLECTION.create_index("xUsername", unique=True)
 
     async def check_db(self) -> None:
         try:
@@ -69,7 +206,7 @@ class MongoDB:
             {"xUserId": x_user_id}, {"$push": {"messageIds": message_id}}, upsert=True
         )
 
-    async def get_drop(self, x_user_id: str) -> dict:
+    async def get_drop(self, x_user_id: str) -> Optional[dict]:
         return await self.DROPS_COLLECTION.find_one({"xUserId": x_user_id})
 
     async def delete_drop(self, x_user_id: str) -> None:
@@ -85,9 +222,455 @@ class MongoDB:
         drops = self.DROPS_COLLECTION.find(condition, projection)
         return [drop async for drop in drops]
 
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        return await self.CHECKPOINTS_COLLECTION.find_one({"name": name})
+
+    async def set_checkpoint(self, name: str, slot: int, signature: str, token: Optional[int] = None) -> bool:
+        if token is None:
+            await self.CHECKPOINTS_COLLECTION.update_one(
+                {"name": name}, {"$set": {"slot": slot, "signature": signature}}, upsert=True
+            )
+            return True
+        try:
+            await self.CHECKPOINTS_COLLECTION.update_one(
+                {"name": name, "$or": [{"token": {"$lte": token}}, {"token": {"$exists": False}}]},
+                {"$set": {"slot": slot, "signature": signature, "token": token}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False  # written under a newer token
+        return True
+
+    async def get_pool_subscriptions(self) -> list[dict]:
+        return [subscription async for subscription in self.POOL_SUBSCRIPTIONS_COLLECTION.find({}, {"_id": 0})]
+
+    async def save_pool_subscription(self, subscription: dict) -> None:
+        await self.POOL_SUBSCRIPTIONS_COLLECTION.update_one(
+            {"chatId": subscription["chatId"]}, {"$set": subscription}, upsert=True
+        )
+
+    async def delete_pool_subscription(self, chat_id: int) -> None:
+        await self.POOL_SUBSCRIPTIONS_COLLECTION.delete_one({"chatId": chat_id})
+
+    async def get_scrapper_tasks(self) -> list[dict]:
+        return [task async for task in self.SCRAPPER_TASKS_COLLECTION.find({}, {"_id": 0})]
+
+    async def save_scrapper_task(self, task: dict) -> None:
+        await self.SCRAPPER_TASKS_COLLECTION.update_one({"chatId": task["chatId"]}, {"$set": task}, upsert=True)
+
+    async def delete_scrapper_task(self, chat_id: int) -> None:
+        await self.SCRAPPER_TASKS_COLLECTION.delete_one({"chatId": chat_id})
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> Optional[int]:
+        now = time.time()
+        try:
+            lease = await self.LEASES_COLLECTION.find_one_and_update(
+                {"name": name, "$or": [{"owner": owner}, {"expiresAt": {"$lt": now}}]},
+                {"$set": {"owner": owner, "expiresAt": now + ttl}, "$inc": {"token": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except DuplicateKeyError:
+            return None  # held by another replica
+        return lease["token"]
+
+    async def renew_lease(self, name: str, owner: str, token: int, ttl: int) -> bool:
+        result = await self.LEASES_COLLECTION.update_one(
+            {"name": name, "owner": owner, "token": token}, {"$set": {"expiresAt": time.time() + ttl}}
+        )
+        return result.matched_count == 1
+
+    async def release_lease(self, name: str, owner: str, token: int) -> None:
+        await self.LEASES_COLLECTION.update_one(
+            {"name": name, "owner": owner, "token": token}, {"$set": {"expiresAt": 0.0}}
+        )
+
+    async def check_lease(self, name: str, owner: str, token: int) -> bool:
+        lease = await self.LEASES_COLLECTION.find_one(
+            {"name": name, "owner": owner, "token": token, "expiresAt": {"$gt": time.time()}}
+        )
+        return lease is not None
+
+    async def save_mint_mention(self, mention: dict) -> None:
+        await self.MINT_MENTIONS_COLLECTION.update_one(
+            {"mint": mention["mint"], "tweetId": mention["tweetId"]}, {"$set": mention}, upsert=True
+        )
+
+    async def get_mint_mentions(self, since: int) -> list[dict]:
+        mentions = self.MINT_MENTIONS_COLLECTION.find({"timestamp": {"$gte": since}}, {"_id": 0})
+        return [mention async for mention in mentions]
+
+    async def delete_mint_mentions(self, before: int) -> None:
+        await self.MINT_MENTIONS_COLLECTION.delete_many({"timestamp": {"$lt": before}})
+
+    async def request_score(self, x_username: str) -> None:
+        await self.SCORE_REQUESTS_COLLECTION.update_one(
+            {"xUsername": x_username}, {"$set": {"requestedAt": time.time(), "score": None}}, upsert=True
+        )
+
+    async def get_score_request(self, x_username: str) -> Optional[dict]:
+        return await self.SCORE_REQUESTS_COLLECTION.find_one({"xUsername": x_username}, {"_id": 0})
+
+    async def get_pending_score_requests(self) -> list[dict]:
+        requests = self.SCORE_REQUESTS_COLLECTION.find({"score": None}, {"_id": 0}).sort("requestedAt", 1)
+        return [request async for request in requests]
+
+    async def save_score(self, x_username: str, score: float) -> None:
+        await self.SCORE_REQUESTS_COLLECTION.update_one(
+            {"xUsername": x_username}, {"$set": {"score": score, "scoredAt": time.time()}}
+        )
+
+
+SQL_TYPES: Dict[str, str] = {
+    "string": "TEXT",
+    "number": "REAL",
+    "integer": "INTEGER",
+    "boolean": "INTEGER",
+    "list": "TEXT",
+    "dict": "TEXT",
+}
+
+
+SQL_OPERATORS: Dict[str, str] = {"$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def _where(condition: Optional[dict], schema: Dict[str, Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """Translate the subset of the Mongo query language used by the bot into a SQL WHERE clause."""
+    clauses: List[str] = []
+    params: List[Any] = []
+    for field, expected in (condition or {}).items():
+        if field not in schema:
+            raise ValueError(f"Unknown field '{field}'")
+        operators = expected if isinstance(expected, dict) else {"$eq": expected}
+        for op, operand in operators.items():
+            if op == "$eq":
+                clauses.append(f"{field} IS NULL" if operand is None else f"{field} = ?")
+            elif op == "$ne":
+                # Mongo's $ne also matches documents without the field
+                clauses.append(f"{field} IS NOT NULL" if operand is None else f"({field} IS NULL OR {field} != ?)")
+            elif op in ("$in", "$nin"):
+                marks = ", ".join("?" for _ in operand)
+                clauses.append(
+                    f"{field} IN ({marks})" if op == "$in" else f"({field} IS NULL OR {field} NOT IN ({marks}))"
+                )
+                params.extend(operand)
+                continue
+            elif op in SQL_OPERATORS:
+                clauses.append(f"{field} {SQL_OPERATORS[op]} ?")
+            else:
+                raise ValueError(f"Unsupported operator '{op}'")
+            if operand is not None:
+                params.append(operand)
+    return " AND ".join(clauses) or "1", params
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return doc
+    included = {field for field, flag in projection.items() if flag and field != "_id"}
+    if included:
+        result = {field: doc[field] for field in included if field in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {field: value for field, value in doc.items() if projection.get(field, 1)}
+
+
+class SQLiteDB(Storage):
+    """Embedded storage backend on SQLite in WAL mode.
+
+    All statements run on a single dedicated thread, which serializes writes the same way a
+    single Mongo primary would and keeps the event loop free.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH) -> None:
+        """Initialize SQLite storage."""
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self.schemas: Dict[str, Dict[str, Dict[str, Any]]] = {
+            "banned": banned_schema,
+            "drops": drops_schema,
+            "checkpoints": checkpoints_schema,
+            "pool_subscriptions": pool_subscriptions_schema,
+            "mint_mentions": mint_mentions_schema,
+            "scrapper_tasks": scrapper_tasks_schema,
+            "leases": leases_schema,
+            "score_requests": score_requests_schema,
+        }
+        self.compound_keys: Dict[str, Tuple[str, ...]] = {"mint_mentions": mint_mentions_key}
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def initialize(self) -> None:
+        LOGGER.info(f"Opening SQLite storage at {self.path}...")
+        await self._run(self._connect)
+
+    def _connect(self) -> None:
+        self.conn = sqlite3.connect(self.path, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        for table, schema in self.schemas.items():
+            columns = ", ".join(f"{field} {SQL_TYPES[spec['type']]}" for field, spec in schema.items())
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (_id INTEGER PRIMARY KEY, {columns})")
+            existing = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+            for field, spec in schema.items():
+                if field not in existing:  # added to the schema after the table was created
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {field} {SQL_TYPES[spec['type']]}")
+            for field, spec in schema.items():
+                if spec.get("unique") or spec.get("index"):
+                    unique = "UNIQUE " if spec.get("unique") else ""
+                    self.conn.execute(f"CREATE {unique}INDEX IF NOT EXISTS {table}_{field} ON {table} ({field})")
+                else:
+                    self.conn.execute(f"DROP INDEX IF EXISTS {table}_{field}")  # left by earlier versions
+        for table, key in self.compound_keys.items():
+            columns = ", ".join(key)
+            # Earlier versions inserted without a key, so drop the duplicates before enforcing it
+            self.conn.execute(f"DELETE FROM {table} WHERE _id NOT IN (SELECT MIN(_id) FROM {table} GROUP BY {columns})")
+            self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_{'_'.join(key)} ON {table} ({columns})")
+
+    def _to_doc(self, table: str, row: sqlite3.Row) -> dict:
+        doc: Dict[str, Any] = {"_id": row["_id"]}
+        for field, spec in self.schemas[table].items():
+            value = row[field]
+            if value is None:
+                continue
+            if spec["type"] in ("list", "dict"):
+                value = json.loads(value)
+            elif spec["type"] == "boolean":
+                value = bool(value)
+            doc[field] = value
+        return doc
+
+    def _find_one(self, table: str, value: str, field: str = "xUserId") -> Optional[dict]:
+        assert self.conn
+        row = self.conn.execute(f"SELECT * FROM {table} WHERE {field} = ?", (value,)).fetchone()
+        return self._to_doc(table, row) if row else None
+
+    def _push(self, field: str, x_user_id: str, value: Any) -> None:
+        assert self.conn
+        row = self.conn.execute(f"SELECT {field} FROM drops WHERE xUserId = ?", (x_user_id,)).fetchone()
+        if row is None:
+            self.conn.execute(
+                f"INSERT INTO drops (xUserId, {field}) VALUES (?, ?)",
+                (x_user_id, json.dumps([value])),
+            )
+            return
+        values = json.loads(row[field]) if row[field] else []
+        values.append(value)
+        self.conn.execute(f"UPDATE drops SET {field} = ? WHERE xUserId = ?", (json.dumps(values), x_user_id))
+
+    def _execute(self, sql: str, *params: Any) -> None:
+        assert self.conn
+        self.conn.execute(sql, params)
+
+    def _upsert(self, table: str, key: Union[str, Tuple[str, ...]], doc: dict) -> None:
+        assert self.conn
+        keys = (key,) if isinstance(key, str) else key
+        fields = list(doc)
+        updates = ", ".join(f"{field} = excluded.{field}" for field in fields if field not in keys)
+        self.conn.execute(
+            f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' for _ in fields)}) "
+            f"ON CONFLICT({', '.join(keys)}) DO UPDATE SET {updates}",
+            [json.dumps(doc[field]) if isinstance(doc[field], (list, dict)) else doc[field] for field in fields],
+        )
+
+    def _select_all(self, table: str) -> List[dict]:
+        assert self.conn
+        return [self._to_doc(table, row) for row in self.conn.execute(f"SELECT * FROM {table}")]
+
+    def _update(self, sql: str, *params: Any) -> int:
+        assert self.conn
+        return self.conn.execute(sql, params).rowcount
+
+    def _acquire_lease(self, name: str, owner: str, ttl: int) -> Optional[int]:
+        assert self.conn
+        # Take the write lock before reading, so replicas sharing the file cannot both win
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            lease = self._find_one("leases", name, "name")
+            now = time.time()
+            if lease and lease.get("owner") != owner and lease.get("expiresAt", 0.0) >= now:
+                return None
+            token = (lease.get("token", 0) if lease else 0) + 1
+            self._upsert("leases", "name", {"name": name, "owner": owner, "token": token, "expiresAt": now + ttl})
+            return token
+        finally:
+            self.conn.execute("COMMIT")
+
+    def _select_where(self, table: str, clause: str, *params: Any) -> List[dict]:
+        assert self.conn
+        return [self._to_doc(table, row) for row in self.conn.execute(f"SELECT * FROM {table} WHERE {clause}", params)]
+
+    async def insert_banned(self, x_user_id: str) -> None:
+        await self._run(self._execute, "INSERT OR IGNORE INTO banned (xUserId) VALUES (?)", x_user_id)
+
+    async def insert_drop(self, x_user_id: str, x_username: str, post_id: Optional[str] = None) -> None:
+        await self._run(
+            self._execute,
+            "INSERT OR IGNORE INTO drops (xUserId, xUsername, score, postIds, messageIds) VALUES (?, ?, ?, ?, ?)",
+            x_user_id,
+            x_username,
+            0.0,
+            json.dumps([post_id] if post_id else []),
+            json.dumps([]),
+        )
+
+    async def update_drop_score(self, x_user_id: str, score: float) -> None:
+        await self._run(
+            self._execute,
+            "INSERT INTO drops (xUserId, score) VALUES (?, ?) "
+            "ON CONFLICT(xUserId) DO UPDATE SET score = excluded.score",
+            x_user_id,
+            score,
+        )
+
+    async def update_drop_posts(self, x_user_id: str, post_id: str) -> None:
+        await self._run(self._push, "postIds", x_user_id, post_id)
+
+    async def update_drop_messages(self, x_user_id: str, message_id: int) -> None:
+        await self._run(self._push, "messageIds", x_user_id, message_id)
+
+    async def get_drop(self, x_user_id: str) -> Optional[dict]:
+        return await self._run(self._find_one, "drops", x_user_id)
+
+    async def delete_drop(self, x_user_id: str) -> None:
+        await self._run(self._execute, "DELETE FROM drops WHERE xUserId = ?", x_user_id)
+
+    async def check_drop(self, x_user_id: str) -> bool:
+        return await self._run(self._find_one, "drops", x_user_id) is not None
+
+    async def check_banned(self, x_user_id: str) -> bool:
+        return await self._run(self._find_one, "banned", x_user_id) is not None
+
+    async def get_drops(self, condition: Optional[dict], projection: Optional[dict]) -> list[dict]:
+        clause, params = _where(condition, self.schemas["drops"])
+        drops = await self._run(self._select_where, "drops", clause, *params)
+        return [_project(drop, projection) for drop in drops]
+
+    async def get_checkpoint(self, name: str) -> Optional[dict]:
+        return await self._run(self._find_one, "checkpoints", name, "name")
+
+    async def set_checkpoint(self, name: str, slot: int, signature: str, token: Optional[int] = None) -> bool:
+        if token is None:
+            await self._run(
+                self._execute,
+                "INSERT INTO checkpoints (name, slot, signature) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET slot = excluded.slot, signature = excluded.signature",
+                name,
+                slot,
+                signature,
+            )
+            return True
+        updated = await self._run(
+            self._update,
+            "INSERT INTO checkpoints (name, slot, signature, token) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET slot = excluded.slot, signature = excluded.signature, "
+            "token = excluded.token WHERE checkpoints.token IS NULL OR checkpoints.token <= excluded.token",
+            name,
+            slot,
+            signature,
+            token,
+        )
+        return updated == 1
+
+    async def get_pool_subscriptions(self) -> list[dict]:
+        subscriptions = await self._run(self._select_all, "pool_subscriptions")
+        return [_project(subscription, {"_id": 0}) for subscription in subscriptions]
+
+    async def save_pool_subscription(self, subscription: dict) -> None:
+        await self._run(self._upsert, "pool_subscriptions", "chatId", subscription)
+
+    async def delete_pool_subscription(self, chat_id: int) -> None:
+        await self._run(self._execute, "DELETE FROM pool_subscriptions WHERE chatId = ?", chat_id)
+
+    async def get_scrapper_tasks(self) -> list[dict]:
+        tasks = await self._run(self._select_all, "scrapper_tasks")
+        return [_project(task, {"_id": 0}) for task in tasks]
+
+    async def save_scrapper_task(self, task: dict) -> None:
+        await self._run(self._upsert, "scrapper_tasks", "chatId", task)
+
+    async def delete_scrapper_task(self, chat_id: int) -> None:
+        await self._run(self._execute, "DELETE FROM scrapper_tasks WHERE chatId = ?", chat_id)
+
+    async def acquire_lease(self, name: str, owner: str, ttl: int) -> Optional[int]:
+        return await self._run(self._acquire_lease, name, owner, ttl)
+
+    async def renew_lease(self, name: str, owner: str, token: int, ttl: int) -> bool:
+        updated = await self._run(
+            self._update,
+            "UPDATE leases SET expiresAt = ? WHERE name = ? AND owner = ? AND token = ?",
+            time.time() + ttl,
+            name,
+            owner,
+            token,
+        )
+        return updated == 1
+
+    async def release_lease(self, name: str, owner: str, token: int) -> None:
+        await self._run(
+            self._execute,
+            "UPDATE leases SET expiresAt = 0 WHERE name = ? AND owner = ? AND token = ?",
+            name,
+            owner,
+            token,
+        )
+
+    async def check_lease(self, name: str, owner: str, token: int) -> bool:
+        leases = await self._run(
+            self._select_where,
+            "leases",
+            "name = ? AND owner = ? AND token = ? AND expiresAt > ?",
+            name,
+            owner,
+            token,
+            time.time(),
+        )
+        return bool(leases)
+
+    async def save_mint_mention(self, mention: dict) -> None:
+        await self._run(self._upsert, "mint_mentions", mint_mentions_key, mention)
+
+    async def get_mint_mentions(self, since: int) -> list[dict]:
+        mentions = await self._run(self._select_where, "mint_mentions", "timestamp >= ?", since)
+        return [_project(mention, {"_id": 0}) for mention in mentions]
+
+    async def delete_mint_mentions(self, before: int) -> None:
+        await self._run(self._execute, "DELETE FROM mint_mentions WHERE timestamp < ?", before)
+
+    async def request_score(self, x_username: str) -> None:
+        request = {"xUsername": x_username, "requestedAt": time.time(), "score": None}
+        await self._run(self._upsert, "score_requests", "xUsername", request)
+
+    async def get_score_request(self, x_username: str) -> Optional[dict]:
+        request = await self._run(self._find_one, "score_requests", x_username, "xUsername")
+        return _project(request, {"_id": 0}) if request else None
+
+    async def get_pending_score_requests(self) -> list[dict]:
+        requests = await self._run(self._select_where, "score_requests", "score IS NULL ORDER BY requestedAt")
+        return [_project(request, {"_id": 0}) for request in requests]
+
+    async def save_score(self, x_username: str, score: float) -> None:
+        await self._run(
+            self._execute,
+            "UPDATE score_requests SET score = ?, scoredAt = ? WHERE xUsername = ?",
+            score,
+            time.time(),
+            x_username,
+        )
+
+
+def create_storage() -> Storage:
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteDB()
+    return MongoDB()
+
 
 async def test() -> None:
-    db = MongoDB()
+    db = create_storage()
     await db.initialize()
 
     drops = await db.get_drops(
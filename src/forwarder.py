@@ -0,0 +1,250 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from os import getenv
+from typing import Any, Dict, List, Optional, Pattern, Tuple, Union
+
+from dotenv import load_dotenv
+from telethon import TelegramClient, errors, events  # type: ignore
+from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto  # type: ignore
+
+import metrics
+from leases import Lease, LeaseManager
+from outbound import Failure, OutboundDispatcher
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+ROUTES_PATH: str = getenv("FORWARD_ROUTES", "routes.json")
+RELOAD_INTERVAL: int = int(getenv("FORWARD_RELOAD_INTERVAL", "30"))  # seconds
+MODES = ("post", "copy")
+LEASE_NAME: str = "forwarder"
+
+
+def classify_telethon_error(error: Exception) -> Optional[Tuple[Failure, float]]:
+    """Map user-bot errors onto the dispatcher's flood wait and retry handling."""
+    if isinstance(error, errors.FloodError):
+        return Failure.FLOOD, float(getattr(error, "seconds", 0) or 1)
+    if isinstance(error, errors.BadRequestError):
+        return Failure.FATAL, 0.0
+    if isinstance(error, (errors.RPCError, ConnectionError)):
+        return Failure.TRANSIENT, 0.0
+    return None
+
+
+@dataclass
+class Destination:
+    chat_id: int
+    topic_id: Optional[int] = None
+
+
+class Predicate:
+    """Message filter compiled once when its route is loaded.
+
+    `entity_urls` matches when any entity URL contains one of the given fragments and `patterns`
+    are joined into a single case-insensitive regex searched in the message text; an empty
+    predicate matches every message.
+    """
+
+    def __init__(self, entity_urls: List[str], patterns: List[str]) -> None:
+        """Initialize Predicate."""
+        self.entity_urls = tuple(entity_urls)
+        self.regex: Optional[Pattern[str]] = (
+            re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE) if patterns else None
+        )
+
+    def __call__(self, message: Any) -> bool:
+        if self.entity_urls:
+            urls = [entity.url for entity in message.entities or [] if getattr(entity, "url", None)]
+            if not any(fragment in url for url in urls for fragment in self.entity_urls):
+                return False
+        if self.regex and not self.regex.search(message.message or ""):
+            return False
+        return True
+
+
+@dataclass
+class Route:
+    name: str
+    mode: str  # "post" re-posts under a source header, "copy" re-sends the text with its entities
+    predicate: Predicate
+    destinations: List[Destination]
+    link: str = ""
+
+
+class Forwarder:
+    """Route user-bot messages from source chats to destination chats following a routing table.
+
+    The table is loaded from `FORWARD_ROUTES` (or the given defaults when the file is missing) and
+    reloaded whenever the file changes. Routes are indexed by source chat id, so every message costs
+    one dict lookup, and the sends to all matching destinations run concurrently through a rate
+    limited queue. Media is sent by reference and albums as a single batch, so nothing is re-uploaded.
+    Every replica's user-bot sees the same messages, so only the holder of the forwarder lease routes them.
+    """
+
+    def __init__(
+        self,
+        client: TelegramClient,
+        path: str = ROUTES_PATH,
+        default_routes: Optional[List[dict]] = None,
+        leases: Optional[LeaseManager] = None,
+    ) -> None:
+        """Initialize Forwarder."""
+        self.client = client
+        self.leases = leases
+        self.lease: Optional[Lease] = None
+        self.path = path
+        self.default_routes = default_routes or []
+        self.routes: Dict[int, List[Route]] = {}
+        self.mtime: Optional[float] = None
+        self.queue = OutboundDispatcher(name="forward.outbound", classify=classify_telethon_error)
+
+    def register(self) -> None:
+        self.client.add_event_handler(self.handle_message, events.NewMessage(incoming=True))
+        self.client.add_event_handler(self.handle_album, events.Album())
+
+    def unregister(self) -> None:
+        self.client.remove_event_handler(self.handle_message)
+        self.client.remove_event_handler(self.handle_album)
+
+    async def run(self, lease: Lease) -> None:
+        """Forward messages on this replica for as long as it holds the lease."""
+        self.lease = lease
+        self.register()
+        try:
+            await self.load()
+            await self.watch()
+        finally:
+            self.unregister()
+            self.lease = None
+
+    def _read_config(self) -> List[dict]:
+        if not os.path.exists(self.path):
+            return self.default_routes
+        with open(self.path) as file:
+            return json.load(file)["routes"]
+
+    async def _compile(self, config: List[dict]) -> Dict[int, List[Route]]:
+        """Compile the routes one by one, so a source that fails to resolve only disables its own route."""
+        routes: Dict[int, List[Route]] = {}
+        for entry in config:
+            try:
+                source_id, route = await self._compile_route(entry)
+            except Exception as e:
+                LOGGER.error(f"Skipping forwarding route {entry.get('name') or entry.get('source')}: {e}")
+                continue
+            routes.setdefault(source_id, []).append(route)
+        return routes
+
+    async def _compile_route(self, entry: dict) -> Tuple[int, Route]:
+        mode = entry.get("mode", "post")
+        if mode not in MODES:
+            raise ValueError(f"Unknown mode '{mode}' in route {entry.get('name')}")
+        source: Union[int, str] = entry["source"]
+        source_id = await self.client.get_peer_id(source)
+        route = Route(
+            name=entry.get("name", str(source)),
+            mode=mode,
+            predicate=Predicate(entry.get("entity_urls", []), entry.get("patterns", [])),
+            destinations=[Destination(int(d["chat_id"]), d.get("topic_id")) for d in entry["destinations"]],
+            link=entry.get("link", ""),
+        )
+        return source_id, route
+
+    async def load(self) -> None:
+        """Load the routing table, keeping the current one if the new config is invalid."""
+        self.mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+        try:
+            routes = await self._compile(self._read_config())
+        except Exception as e:
+            LOGGER.error(f"Failed to load forwarding routes from {self.path}: {e}")
+            return
+        self.routes = routes
+        LOGGER.info(f"Loaded {sum(len(r) for r in routes.values())} forwarding routes for {len(routes)} sources")
+
+    async def watch(self, interval: int = RELOAD_INTERVAL) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            mtime = os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            if mtime != self.mtime:
+                await self.load()
+
+    async def handle_message(self, event: events.NewMessage.Event) -> None:
+        if event.message.grouped_id:
+            return  # delivered as a whole by `handle_album`
+        await self._dispatch(event.chat_id, [event.message])
+
+    async def handle_album(self, event: events.Album.Event) -> None:
+        if event.messages[0].out:
+            return
+        await self._dispatch(event.chat_id, event.messages)
+
+    async def _dispatch(self, chat_id: int, messages: List[Any]) -> None:
+        routes = self.routes.get(chat_id)
+        if not routes:
+            return
+        if self.lease and self.leases and not await self.leases.fenced(self.lease):
+            LOGGER.warning(f"Forwarder lease is not confirmed, not forwarding {len(messages)} messages from {chat_id}")
+            return
+        anchor = next((message for message in messages if message.message), messages[0])
+        sends = [
+            self._send(route, destination, messages)
+            for route in routes
+            if route.predicate(anchor)
+            for destination in route.destinations
+        ]
+        await asyncio.gather(*sends)
+
+    async def _send(self, route: Route, destination: Destination, messages: List[Any]) -> None:
+        try:
+            sent = await self.queue.submit(destination.chat_id, lambda: self._deliver(route, destination, messages))
+        except Exception as e:
+            LOGGER.error(f"Failed to forward a post from {route.name} to {destination.chat_id}: {e}")
+            sent = None
+        if sent is None:  # the dispatcher gave up after its retries
+            metrics.counter(f"forward.{route.name}.failed").inc()
+            return
+        latency = (datetime.now(timezone.utc) - messages[0].date).total_seconds()
+        metrics.latency(f"forward.{route.name}.latency").observe(max(0.0, latency))
+        metrics.counter(f"forward.{route.name}.forwarded").inc()
+
+    def _header(self, route: Route, messages: List[Any], text: str) -> str:
+        return (
+            f"<b>- NEW POST BY {route.name.upper()} -</b>\n\n"
+            f"<blockquote>{text}</blockquote>\n\n"
+            f"<a href='{route.link}/{messages[0].id}'>🔗 Source</a>"
+        )
+
+    async def _deliver(self, route: Route, destination: Destination, messages: List[Any]) -> Any:
+        anchor = next((message for message in messages if message.message), messages[0])
+        media = [
+            message.media
+            for message in messages
+            if isinstance(message.media, (MessageMediaPhoto, MessageMediaDocument))
+        ]
+        if route.mode == "post":
+            options: Dict[str, Any] = {"parse_mode": "html"}
+            text = self._header(route, messages, anchor.message or "")
+        else:
+            options = {"formatting_entities": anchor.entities} if len(media) <= 1 else {}
+            text = anchor.message or ""
+
+        if media:
+            return await self.client.send_file(
+                destination.chat_id,
+                media if len(media) > 1 else media[0],
+                caption=text,
+                reply_to=destination.topic_id,
+                **options,
+            )
+        return await self.client.send_message(
+            destination.chat_id,
+            text,
+            reply_to=destination.topic_id,
+            link_preview=route.mode == "copy",
+            **options,
+        )
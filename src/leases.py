@@ -0,0 +1,153 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass
+from os import getenv
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+import metrics
+from db import Storage
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+OWNER: str = getenv("REPLICA_ID") or f"{socket.gethostname()}:{os.getpid()}"
+LEASE_TTL: int = int(getenv("LEASE_TTL", "30"))  # seconds a lease survives without a heartbeat
+HEARTBEAT_INTERVAL: int = int(getenv("LEASE_HEARTBEAT_INTERVAL", "10"))  # seconds
+
+
+@dataclass
+class Lease:
+    name: str
+    token: int  # fencing token, bumped on every acquisition
+    expires: float  # monotonic deadline after which the lease must be assumed lost
+
+    def held(self) -> bool:
+        return time.monotonic() < self.expires
+
+
+class LeaseManager:
+    """Cluster-wide ownership of long running work through leases kept in storage.
+
+    Each replica registers the work it knows about by name. On every tick it renews the leases it
+    holds, cancels the work whose lease it lost and claims unowned or expired leases. Every
+    acquisition bumps the lease's fencing token, so a replica that stalled past its lease can no
+    longer renew or release it once another replica took over.
+    """
+
+    def __init__(
+        self, db: Storage, owner: str = OWNER, ttl: int = LEASE_TTL, interval: int = HEARTBEAT_INTERVAL
+    ) -> None:
+        """Initialize LeaseManager."""
+        self.db = db
+        self.owner = owner
+        self.ttl = ttl
+        self.interval = interval
+        self.work: Dict[str, Callable[[Lease], Awaitable[None]]] = {}
+        self.running: Dict[str, Tuple[Lease, "asyncio.Task[None]"]] = {}
+        self.acquiring = asyncio.Lock()
+        self.acquired = metrics.counter("leases.acquired")
+        self.lost = metrics.counter("leases.lost")
+        self.held = metrics.gauge("leases.held")
+
+    def register(self, name: str, run: Callable[[Lease], Awaitable[None]]) -> None:
+        """Declare work that should run on some replica; it is claimed on the next tick."""
+        self.work[name] = run
+
+    async def claim(self, name: str, run: Callable[[Lease], Awaitable[None]]) -> bool:
+        """Register work and try to take it right away, returning whether this replica runs it."""
+        self.register(name, run)
+        return await self._acquire(name)
+
+    async def drop(self, name: str) -> None:
+        """Forget the work and stop it if it runs here."""
+        self.work.pop(name, None)
+        entry = self.running.pop(name, None)
+        if entry is None:
+            return
+        lease, task = entry
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # A task cancelled before its first step never reaches the release in `_guard`
+        await self.db.release_lease(name, self.owner, lease.token)
+        self.held.set(len(self.running))
+
+    async def fenced(self, lease: Lease) -> bool:
+        """Whether the lease is still ours according to storage, not just the local deadline."""
+        return lease.held() and await self.db.check_lease(lease.name, self.owner, lease.token)
+
+    def names(self, prefix: str) -> List[str]:
+        return [name for name in self.work if name.startswith(prefix)]
+
+    async def tick(self) -> None:
+        for name in [name for name in self.running if name not in self.work]:
+            await self.drop(name)
+        for name, (lease, task) in list(self.running.items()):
+            started = time.monotonic()
+            if await self.db.renew_lease(name, self.owner, lease.token, self.ttl):
+                lease.expires = started + self.ttl
+                continue
+            LOGGER.warning(f"Lost the lease on {name}, stopping it on this replica")
+            self.lost.inc()
+            self.running.pop(name, None)
+            task.cancel()
+        for name in list(self.work):
+            await self._acquire(name)
+        self.held.set(len(self.running))
+
+    async def run(self, syncs: List[Callable[[], Awaitable[None]]]) -> None:
+        """Refresh the registered work from the shared registry and heartbeat, forever."""
+        while True:
+            for sync in syncs:
+                try:
+                    await sync()
+                except Exception as e:
+                    LOGGER.error(f"Failed to sync the work registry: {e}")
+            try:
+                await self.tick()
+            except Exception as e:
+                LOGGER.error(f"Lease heartbeat failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _acquire(self, name: str) -> bool:
+        # Serialized, so a claim and a tick racing for the same name cannot both bump its token
+        async with self.acquiring:
+            if name in self.running:
+                return True
+            started = time.monotonic()
+            token = await self.db.acquire_lease(name, self.owner, self.ttl)
+            if token is None:
+                return False
+            if name not in self.work:  # dropped while the lease was being taken
+                await self.db.release_lease(name, self.owner, token)
+                return False
+            lease = Lease(name, token, started + self.ttl)
+            LOGGER.info(f"Acquired the lease on {name} with token {token}")
+            self.acquired.inc()
+            self.running[name] = (lease, asyncio.create_task(self._guard(name, lease)))
+            self.held.set(len(self.running))
+            return True
+
+    async def _guard(self, name: str, lease: Lease) -> None:
+        try:
+            await self.work[name](lease)
+            self.work.pop(name, None)  # finished on its own, nothing left to run anywhere
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOGGER.error(f"{name} failed, releasing its lease for a retry: {e}")
+        finally:
+            if self.running.get(name, (None,))[0] is lease:
+                del self.running[name]
+                self.held.set(len(self.running))
+            try:
+                await self.db.release_lease(name, self.owner, lease.token)
+            except Exception as e:
+                LOGGER.error(f"Failed to release the lease on {name}: {e}")
@@ -7,15 +7,22 @@ from typing import Dict, List
 
 from aiogram import Bot, Dispatcher, F
 from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.enums import ParseMode
 from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.types import CallbackQuery, ChatMemberAdministrator, InlineKeyboardButton, InlineKeyboardMarkup, Message
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 from dotenv import load_dotenv
-from telethon import TelegramClient, events  # type: ignore
+from telethon import TelegramClient  # type: ignore
 from telethon.sessions import StringSession  # type: ignore
-from telethon.tl.types import MessageMediaDocument, MessageMediaPhoto  # type: ignore
 
 import db
+import forwarder
+import leases
+import metrics
+import mints
 import pools
 import scoring
 import twitter
@@ -32,6 +39,14 @@ MAIN_GROUP_ID: int = int(os.getenv("MAIN_GROUP_ID", "0"))
 WALLET_TRACK_BOT_NAME: str = os.getenv("WALLET_TRACK_BOT_NAME", "")
 WALLET_TRACK_GROUP_ID: int = int(os.getenv("WALLET_TRACK_GROUP_ID", 0))
 ALLOWED_USERS: List[int] = [int(user) for user in os.getenv("ALLOWED_USERS", "").split(",")]
+BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "")
+WEBHOOK_URL: str = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8080"))
+DIGEST_WINDOW: int = int(os.getenv("DIGEST_WINDOW", "0"))  # seconds, 0 posts low-tier tweets immediately
 
 HANDLE: str = "@xcryptoscrapper_bot"
 TITLE: str = "🔰 XScrapper V1.0"
@@ -39,12 +54,34 @@ NAME: str = "XCryptoScrapperBot"
 DESCRIPTION: str = "The ultimate bot for scrapping Pump.fun drops"
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
+INFLUENCERS_TOPIC_ID: int = 165503
 TARGET_CHANNELS: List[dict] = [
     {"id": -1002158735564, "name": "Qwerty", "link": "https://t.me/QwertysQuants"},
     {"id": -1002089676082, "name": "joji", "link": "https://t.me/jojiinnercircle"},
     {"id": -1002001411256, "name": "Borovik", "link": "https://t.me/borovikTG"},
     {"id": -1002047101414, "name": "Orangie", "link": "https://t.me/orangiealpha"},
 ]
+# Used when no FORWARD_ROUTES file is present
+DEFAULT_ROUTES: List[dict] = [
+    {
+        "name": channel["name"],
+        "source": channel["id"],
+        "link": channel["link"],
+        "mode": "post",
+        "destinations": [{"chat_id": MAIN_GROUP_ID, "topic_id": INFLUENCERS_TOPIC_ID}],
+    }
+    for channel in TARGET_CHANNELS
+]
+if WALLET_TRACK_BOT_NAME:
+    DEFAULT_ROUTES.append(
+        {
+            "name": "Wallet tracker",
+            "source": WALLET_TRACK_BOT_NAME,
+            "mode": "copy",
+            "entity_urls": ["solscan"],
+            "destinations": [{"chat_id": WALLET_TRACK_GROUP_ID}],
+        }
+    )
 
 COMMANDS: Dict[str, str] = {
     "run": "Start Twitter scrapper",
@@ -55,12 +92,18 @@ COMMANDS: Dict[str, str] = {
 }
 
 DISPATCHER: Dispatcher = Dispatcher()
-DB: db.MongoDB = db.MongoDB()
-BOT: Bot = Bot(token=BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+DB: db.Storage = db.create_storage()
+BOT: Bot = Bot(
+    token=BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(TELEGRAM_API_URL)) if TELEGRAM_API_URL else None,
+    default=DefaultBotProperties(parse_mode=ParseMode.HTML),
+)
 USER_BOT_CLIENT: TelegramClient = TelegramClient(StringSession(USER_BOT_SESSION), USER_BOT_APP_ID, USER_BOT_APP_HASH)
-NEW_POOLS: pools.NewPoolsScrapper = pools.NewPoolsScrapper(RPC, BOT)
+LEASES: leases.LeaseManager = leases.LeaseManager(DB)
+NEW_POOLS: pools.NewPoolsScrapper = pools.NewPoolsScrapper(RPC, BOT, DB, LEASES)
 SCORER: scoring.Scrapper = scoring.Scrapper() 
-TWITTER: twitter.TwitterScrapper = twitter.TwitterScrapper(BOT, DB, SCORER)
+TWITTER: twitter.TwitterScrapper = twitter.TwitterScrapper(BOT, DB, SCORER, LEASES)
+FORWARDER: forwarder.Forwarder = forwarder.Forwarder(USER_BOT_CLIENT, default_routes=DEFAULT_ROUTES, leases=LEASES)
 
 
 @DISPATCHER.message(CommandStart())
@@ -106,16 +149,14 @@ async def command_run_handler(message: Message) -> None:
         queries=[twitter.PUMP_QUERY],
         topic_ids=topic_ids,
         type=twitter.ScrapperType.PUMP,
+        digest_windows={"0": DIGEST_WINDOW} if DIGEST_WINDOW else {},
     )
     asyncio.create_task(TWITTER.start(chat_id, options=options))
 
 
 @DISPATCHER.message(Command("runpools"))
-async def command_run_pools_handler(message: Message) -> None:
+async def command_run_pools_handler(message: Message, command: CommandObject) -> None:
     """Handle messages with `/runpools` command."""
-    if message.chat.id != MAIN_GROUP_ID:
-        await message.reply("This command is only available in the CALL CENTER.")
-
     if not message.chat.is_forum:
         await message.reply("This command is only available in groups with topics.")
         return
@@ -133,7 +174,31 @@ async def command_run_pools_handler(message: Message) -> None:
         await message.answer("You must be an admin to start the scrapper.", show_alert=True)
         return
 
-    asyncio.create_task(NEW_POOLS.start(message.chat.id))
+    min_allocation = 0
+    require_socials = False
+    for arg in (command.args or "").split():
+        if arg.isdigit():
+            min_allocation = int(arg)
+        elif arg.lower() == "socials":
+            require_socials = True
+        else:
+            await message.answer(
+                "Invalid arguments. Usage: /runpools [min top holders allocation %] [socials]\n\n"
+                "Example: /runpools 30 socials"
+            )
+            return
+
+    if message.is_topic_message:
+        topic_id = message.message_thread_id
+    else:
+        topic_id = pools.DEFAULT_TOPIC_ID if message.chat.id == MAIN_GROUP_ID else None
+    subscription = pools.PoolSubscription(
+        chat_id=message.chat.id,
+        topic_id=topic_id,
+        min_top_holders_allocation=min_allocation,
+        require_socials=require_socials,
+    )
+    await NEW_POOLS.start(subscription)
 
 
 @DISPATCHER.message(Command("runticker"))
@@ -205,7 +270,7 @@ async def command_stop_pools_handler(message: Message) -> None:
         await message.answer("You must be an admin to stop the scrapper.", show_alert=True)
         return
 
-    await NEW_POOLS.stop()
+    await NEW_POOLS.stop(message.chat.id)
 
 
 @DISPATCHER.message(Command("stop"))
@@ -258,16 +323,22 @@ async def callback_block_handler(query: CallbackQuery) -> None:
     await query.answer(f"Blocking {username}...")
     await DB.insert_banned(user_id)
 
+    async def log_progress(done: int, total: int) -> None:
+        LOGGER.info(f"Deleting messages of {username}: {done}/{total}")
+
+    status = f"<b>{username.upper()}</b> has been blocked"
     drop = await DB.get_drop(user_id)
     if drop:
-        await utils.delete_message(BOT, query.message.chat.id, drop.get("messageIds", []))
+        result = await utils.delete_messages(BOT, query.message.chat.id, drop.get("messageIds", []), log_progress)
         await DB.delete_drop(user_id)
+        if result.failed:
+            status += f"\nFailed to delete {result.failed} of {result.deleted + result.failed} messages"
 
     if isinstance(query.message, Message):
         await BOT.send_message(
             chat_id=query.message.chat.id,
             message_thread_id=query.message.message_thread_id,
-            text=f"<b>{username.upper()}</b> has been blocked",
+            text=status,
             parse_mode=ParseMode.HTML,
         )
 
@@ -287,77 +358,47 @@ async def callback_report_handler(query: CallbackQuery) -> None:
     await query.answer("Reporting is WIP...")
 
 
-@USER_BOT_CLIENT.on(events.NewMessage(chats=WALLET_TRACK_BOT_NAME))
-async def handler(event) -> None: # type: ignore
-    if not event.out:
-        text = event.message.message
-        entities = event.message.entities
-        if utils.has_solscan_url(entities):
-            await USER_BOT_CLIENT.send_message(WALLET_TRACK_GROUP_ID, text, formatting_entities=entities)
-
-
-@USER_BOT_CLIENT.on(events.NewMessage(chats=[ch["id"] for ch in TARGET_CHANNELS]))
-async def handle_message(event: events.NewMessage) -> None:
-    """Handle messages from the influencers."""
-    message_text = event.message.message
-    message_id = event.message.id
-    channel = next((ch for ch in TARGET_CHANNELS if ch["id"] == event.chat_id), None)
-
-    if not channel:
-        return
+async def run_webhook() -> None:
+    """Serve updates pushed by Telegram instead of polling for them.
 
-    LOGGER.info(f"Received Influencer message from {channel['name']}")
+    Every replica registers the same public URL, so replicas can sit behind a load balancer.
+    """
+    secret = WEBHOOK_SECRET or None
+    await BOT.set_webhook(
+        f"{WEBHOOK_URL}{WEBHOOK_PATH}",
+        secret_token=secret,
+        allowed_updates=DISPATCHER.resolve_used_update_types(),
+    )
 
-    if channel:
-        group_link = channel["link"]
-        message_with_link = (
-            f"<b>- NEW POST BY {channel['name'].upper()} -</b>\n\n"
-            f"<blockquote>{message_text}</blockquote>\n\n"
-            f"<a href='{group_link}/{message_id}'>🔗 Source</a>"
-        )
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=DISPATCHER, bot=BOT, secret_token=secret).register(app, path=WEBHOOK_PATH)
+    setup_application(app, DISPATCHER, bot=BOT)
 
-        media = event.message.media
-
-        if media:
-            if isinstance(media, MessageMediaPhoto):
-                await USER_BOT_CLIENT.send_file(
-                    MAIN_GROUP_ID,
-                    media.photo,
-                    caption=message_with_link,
-                    reply_to=165503,
-                    parse_mode="html",
-                )
-            elif isinstance(media, MessageMediaDocument):
-                await USER_BOT_CLIENT.send_file(
-                    MAIN_GROUP_ID,
-                    media.document,
-                    caption=message_with_link,
-                    reply_to=165503,
-                    parse_mode="html",
-                )
-            else:
-                await USER_BOT_CLIENT.send_message(
-                    MAIN_GROUP_ID,
-                    message_with_link,
-                    reply_to=165503,
-                    parse_mode="html",
-                    link_preview=False,
-                )
-        else:
-            await USER_BOT_CLIENT.send_message(
-                MAIN_GROUP_ID,
-                message_with_link,
-                reply_to=165503,
-                parse_mode="html",
-                link_preview=False,
-            )
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        LOGGER.info(f"Listening for webhook updates on {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
 
 
 async def main() -> None:
     async with USER_BOT_CLIENT:
-        SCORER.login()
         await DB.initialize()
-        await DISPATCHER.start_polling(BOT)
+        # Singletons: whichever replica holds the lease logs the scorer in or runs the forwarder
+        LEASES.register(twitter.SCORING_LEASE, TWITTER.score)
+        LEASES.register(forwarder.LEASE_NAME, FORWARDER.run)
+        asyncio.create_task(LEASES.run([NEW_POOLS.sync, TWITTER.sync]))
+        if mints.PERSIST:
+            await mints.MINT_INDEX.restore(DB)
+        asyncio.create_task(metrics.log_periodically())
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await BOT.delete_webhook()
+            await DISPATCHER.start_polling(BOT)
 
 
 if __name__ == "__main__":
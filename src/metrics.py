@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from collections import deque
+from os import getenv
+from typing import Deque, Dict, List, Union
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+METRICS_INTERVAL: int = int(getenv("METRICS_INTERVAL", "300"))  # seconds
+WINDOW: int = 1024
+
+
+class Counter:
+    def __init__(self, name: str) -> None:
+        """Initialize a monotonically increasing counter."""
+        self.name = name
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def render(self) -> str:
+        return f"{self.name}: {self.value}"
+
+
+class Gauge:
+    def __init__(self, name: str) -> None:
+        """Initialize a gauge holding the last observed value."""
+        self.name = name
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self) -> str:
+        return f"{self.name}: {self.value:g}"
+
+
+class Latency:
+    def __init__(self, name: str) -> None:
+        """Initialize a latency tracker over a sliding window of samples."""
+        self.name = name
+        self.count = 0
+        self.max = 0.0
+        self.samples: Deque[float] = deque(maxlen=WINDOW)
+
+    def observe(self, seconds: float) -> None:
+        self.count += 1
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def render(self) -> str:
+        return (
+            f"{self.name}: n={self.count} p50={self.percentile(0.5) * 1000:.0f}ms "
+            f"p95={self.percentile(0.95) * 1000:.0f}ms max={self.max * 1000:.0f}ms"
+        )
+
+
+Metric = Union[Counter, Gauge, Latency]
+REGISTRY: Dict[str, Metric] = {}
+
+
+def counter(name: str) -> Counter:
+    metric = REGISTRY.setdefault(name, Counter(name))
+    assert isinstance(metric, Counter)
+    return metric
+
+
+def gauge(name: str) -> Gauge:
+    metric = REGISTRY.setdefault(name, Gauge(name))
+    assert isinstance(metric, Gauge)
+    return metric
+
+
+def latency(name: str) -> Latency:
+    metric = REGISTRY.setdefault(name, Latency(name))
+    assert isinstance(metric, Latency)
+    return metric
+
+
+def report() -> List[str]:
+    return [REGISTRY[name].render() for name in sorted(REGISTRY)]
+
+
+async def log_periodically(interval: int = METRICS_INTERVAL) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        if REGISTRY:
+            LOGGER.info("Metrics:\n" + "\n".join(report()))
@@ -0,0 +1,161 @@
+import asyncio
+import heapq
+import logging
+import time
+from dataclasses import dataclass, field
+from os import getenv
+from typing import Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+
+import metrics
+from db import Storage
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+WINDOW: int = int(getenv("MINT_INDEX_WINDOW", "86400"))  # seconds a mention or migration stays indexed
+PERSIST: bool = getenv("MINT_INDEX_PERSIST", "false").lower() == "true"
+
+
+@dataclass(slots=True)
+class Mention:
+    tweet_id: str
+    user_id: str
+    username: str
+    score: float
+    timestamp: int
+
+    def to_doc(self, mint: str) -> dict:
+        return {
+            "mint": mint,
+            "tweetId": self.tweet_id,
+            "xUserId": self.user_id,
+            "xUsername": self.username,
+            "score": self.score,
+            "timestamp": self.timestamp,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> Tuple[str, "Mention"]:
+        mention = cls(doc["tweetId"], doc["xUserId"], doc["xUsername"], doc.get("score", 0.0), doc["timestamp"])
+        return doc["mint"], mention
+
+
+@dataclass
+class MintActivity:
+    mint: str
+    mentions: Dict[str, Mention] = field(default_factory=dict)  # by tweet id
+    users: Dict[str, int] = field(default_factory=dict)  # user id -> mentions in the window
+    top_score: float = 0.0
+    migrated_at: Optional[float] = None
+
+    @property
+    def user_count(self) -> int:
+        return len(self.users)
+
+    def add(self, mention: Mention) -> None:
+        self.mentions[mention.tweet_id] = mention
+        self.users[mention.user_id] = self.users.get(mention.user_id, 0) + 1
+        self.top_score = max(self.top_score, mention.score)
+
+    def remove(self, tweet_id: str) -> None:
+        mention = self.mentions.pop(tweet_id, None)
+        if mention is None:
+            return
+        remaining = self.users[mention.user_id] - 1
+        if remaining:
+            self.users[mention.user_id] = remaining
+        else:
+            del self.users[mention.user_id]
+        if mention.score >= self.top_score:
+            self.top_score = max((other.score for other in self.mentions.values()), default=0.0)
+
+    def is_empty(self) -> bool:
+        return not self.mentions and self.migrated_at is None
+
+
+class MintIndex:
+    """In-memory inverted index from a mint to the tweets, users and scores that mentioned it.
+
+    The Twitter pipeline feeds mentions and the pools scrapper marks migrations, so either side
+    can see the other's activity with a dict lookup. Entries expire `window` seconds after they
+    happened, through a heap ordered by time. When a storage is attached with `restore`,
+    mentions are written through and the index survives a restart.
+    """
+
+    def __init__(self, window: int = WINDOW) -> None:
+        """Initialize MintIndex."""
+        self.window = window
+        self.mints: Dict[str, MintActivity] = {}
+        self.expiry: List[Tuple[float, str, str]] = []  # (timestamp, mint, tweet id or "" for a migration)
+        self.db: Optional[Storage] = None
+        self.background: Set[asyncio.Task[None]] = set()
+        self.size = metrics.gauge("mint_index.mints")
+        self.indexed = metrics.counter("mint_index.mentions")
+
+    async def restore(self, db: Storage) -> None:
+        """Attach a storage and load the mentions still inside the window."""
+        self.db = db
+        since = int(time.time() - self.window)
+        await db.delete_mint_mentions(since)
+        docs = await db.get_mint_mentions(since)
+        for doc in docs:
+            self._index(*Mention.from_doc(doc))
+        LOGGER.info(f"Restored {len(docs)} mentions of {len(self.mints)} mints")
+
+    def get(self, mint: str) -> Optional[MintActivity]:
+        self._evict(time.time())
+        return self.mints.get(mint)
+
+    def add(self, mint: str, mention: Mention) -> None:
+        if not self._index(mint, mention) or not self.db:
+            return
+        task = asyncio.create_task(self._save(mint, mention))
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    def mark_migrated(self, mint: str, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        self._evict(now)
+        self.mints.setdefault(mint, MintActivity(mint)).migrated_at = now
+        heapq.heappush(self.expiry, (now, mint, ""))
+        self.size.set(len(self.mints))
+
+    def _index(self, mint: str, mention: Mention) -> bool:
+        now = time.time()
+        self._evict(now)
+        if mention.timestamp < now - self.window:
+            return False
+        activity = self.mints.setdefault(mint, MintActivity(mint))
+        if mention.tweet_id in activity.mentions:
+            return False
+        activity.add(mention)
+        heapq.heappush(self.expiry, (mention.timestamp, mint, mention.tweet_id))
+        self.indexed.inc()
+        self.size.set(len(self.mints))
+        return True
+
+    def _evict(self, now: float) -> None:
+        while self.expiry and self.expiry[0][0] < now - self.window:
+            timestamp, mint, tweet_id = heapq.heappop(self.expiry)
+            activity = self.mints.get(mint)
+            if activity is None:
+                continue
+            if tweet_id:
+                activity.remove(tweet_id)
+            elif activity.migrated_at == timestamp:
+                activity.migrated_at = None
+            if activity.is_empty():
+                del self.mints[mint]
+        self.size.set(len(self.mints))
+
+    async def _save(self, mint: str, mention: Mention) -> None:
+        assert self.db
+        try:
+            await self.db.save_mint_mention(mention.to_doc(mint))
+        except Exception as e:
+            LOGGER.error(f"Failed to persist the mention of {mint} in tweet {mention.tweet_id}: {e}")
+
+
+MINT_INDEX: MintIndex = MintIndex()
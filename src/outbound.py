@@ -0,0 +1,274 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+from os import getenv
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple, TypeVar
+
+from aiogram.exceptions import TelegramAPIError, TelegramBadRequest, TelegramRetryAfter
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+GLOBAL_RATE: float = float(getenv("TG_GLOBAL_RATE", "30"))  # messages per second
+GROUP_RATE: float = float(getenv("TG_GROUP_RATE", "20")) / 60  # messages per second per group
+PRIVATE_RATE: float = float(getenv("TG_PRIVATE_RATE", "1"))  # messages per second per private chat
+CHAT_BURST: float = float(getenv("TG_CHAT_BURST", "3"))
+WORKERS: int = int(getenv("TG_SEND_WORKERS", "8"))
+MAX_ATTEMPTS: int = 3
+MAX_FLOOD_WAITS: int = 5
+MAX_IDLE_BUCKETS: int = 10_000
+RESEND_INTERVAL: float = 1.0  # seconds between broadcast rounds
+
+T = TypeVar("T")
+
+
+class Failure(Enum):
+    FLOOD = "flood"  # wait the given number of seconds, then retry
+    FATAL = "fatal"  # give up right away
+    TRANSIENT = "transient"  # retry with backoff
+
+
+# Maps an exception raised by a send to how it should be handled, `None` for errors that are not the API's
+Classifier = Callable[[Exception], Optional[Tuple[Failure, float]]]
+
+
+def classify_bot_api_error(error: Exception) -> Optional[Tuple[Failure, float]]:
+    if isinstance(error, TelegramRetryAfter):
+        return Failure.FLOOD, float(error.retry_after)
+    if isinstance(error, TelegramBadRequest):
+        return Failure.FATAL, 0.0
+    if isinstance(error, TelegramAPIError):
+        return Failure.TRANSIENT, 0.0
+    return None
+
+
+class Priority(IntEnum):
+    ADMIN = 0
+    SCORES = 1
+    DEFAULT = 2
+    RESEND = 3
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        """Initialize a token bucket refilled at `rate` tokens per second."""
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Return the number of seconds until a token can be consumed."""
+        now = time.monotonic()
+        self._refill(now)
+        wait = max(0.0, self.blocked_until - now)
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return wait
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self) -> bool:
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity and self.blocked_until <= time.monotonic()
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: "asyncio.Future[Any]" = field(compare=False)
+    enqueued: float = field(compare=False)
+    per_chat: bool = field(default=True, compare=False)
+    attempts: int = field(default=0, compare=False)
+    flood_waits: int = field(default=0, compare=False)
+
+
+class OutboundDispatcher:
+    """Single outbound queue for every Bot API call that posts into a chat.
+
+    Jobs are served in priority order and only dispatched once both the global bucket and the
+    bucket of the target chat have a token, so bursts from many scrapper tasks are smoothed out
+    instead of tripping Telegram's flood control. A job that is not ready yet is parked with a
+    timer rather than blocking a worker, so one busy chat does not stall the others. Errors are
+    mapped onto flood waits, retries or failures by `classify`, so the same queue serves any client.
+    """
+
+    def __init__(
+        self, workers: int = WORKERS, name: str = "outbound", classify: Classifier = classify_bot_api_error
+    ) -> None:
+        """Initialize Outbound dispatcher."""
+        self.classify = classify
+        self.queue: asyncio.PriorityQueue[_Job] = asyncio.PriorityQueue()
+        self.global_bucket = TokenBucket(GLOBAL_RATE, GLOBAL_RATE)
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.worker_count = workers
+        self.workers: List[asyncio.Task[None]] = []
+        self.seq = itertools.count()
+        self.depth = metrics.gauge(f"{name}.queue_depth")
+        self.sent = metrics.counter(f"{name}.sent")
+        self.failed = metrics.counter(f"{name}.failed")
+        self.flood_waits = metrics.counter(f"{name}.flood_waits")
+        self.waits = {lane: metrics.latency(f"{name}.wait.{lane.name.lower()}") for lane in Priority}
+
+    async def submit(
+        self,
+        chat_id: int,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.DEFAULT,
+        per_chat: bool = True,
+    ) -> Optional[T]:
+        """Queue a Bot API call and wait for its result, `None` if it ultimately failed.
+
+        Calls that do not post into the chat, like deletions, pass `per_chat=False` and are only
+        limited by the global bucket.
+        """
+        self._ensure_started()
+        future: asyncio.Future[Any] = asyncio.get_running_loop().create_future()
+        self._put(_Job(priority, next(self.seq), chat_id, call, future, time.monotonic(), per_chat))
+        return await future
+
+    def _ensure_started(self) -> None:
+        if self.workers:
+            return
+        self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    def _put(self, job: _Job) -> None:
+        self.queue.put_nowait(job)
+        self.depth.set(self.queue.qsize())
+
+    def _put_later(self, delay: float, job: _Job) -> None:
+        asyncio.get_running_loop().call_later(delay, self._put, job)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= MAX_IDLE_BUCKETS:
+                self.chat_buckets = {cid: b for cid, b in self.chat_buckets.items() if not b.is_idle()}
+            rate = GROUP_RATE if chat_id < 0 else PRIVATE_RATE
+            bucket = TokenBucket(rate, CHAT_BURST)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self.queue.get()
+            self.depth.set(self.queue.qsize())
+            if job.future.done():
+                continue
+
+            chat_bucket = self._chat_bucket(job.chat_id)
+            delay = max(self.global_bucket.delay(), chat_bucket.delay() if job.per_chat else 0.0)
+            if delay > 0:
+                self._put_later(delay, job)
+                continue
+            self.global_bucket.consume()
+            if job.per_chat:
+                chat_bucket.consume()
+            if job.attempts == 0 and job.flood_waits == 0:
+                self.waits[Priority(job.priority)].observe(time.monotonic() - job.enqueued)
+
+            try:
+                result = await job.call()
+                self.sent.inc()
+                if not job.future.done():
+                    job.future.set_result(result)
+            except Exception as e:
+                self._handle_error(job, chat_bucket, e)
+
+    def _handle_error(self, job: _Job, chat_bucket: TokenBucket, error: Exception) -> None:
+        failure = self.classify(error)
+        if failure is None:
+            if not job.future.done():
+                job.future.set_exception(error)
+            return
+        kind, retry_after = failure
+        if kind is Failure.FLOOD:
+            self.flood_waits.inc()
+            job.flood_waits += 1
+            LOGGER.warning(f"Flood control for chat {job.chat_id}, retrying in {retry_after}s")
+            chat_bucket.pause(retry_after)
+            if job.flood_waits >= MAX_FLOOD_WAITS:
+                self._fail(job, error)
+            else:
+                self._put_later(retry_after, job)
+        elif kind is Failure.FATAL:
+            self._fail(job, error)
+        else:
+            job.attempts += 1
+            LOGGER.error(f"Failed to send to chat {job.chat_id}: {error}")
+            if job.attempts >= MAX_ATTEMPTS:
+                self._fail(job, error)
+            else:
+                self._put_later(0.5 * 2**job.attempts, job)
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        LOGGER.error(f"Giving up on chat {job.chat_id} after {job.attempts + job.flood_waits} attempts: {error}")
+        self.failed.inc()
+        if not job.future.done():
+            job.future.set_result(None)
+
+
+@dataclass
+class BroadcastTarget:
+    send: Callable[[], Awaitable[Any]]
+    on_sent: Optional[Callable[[Any], Awaitable[None]]] = None
+
+
+class Broadcaster:
+    """Fan a message out to several chats over a number of timer-spaced rounds.
+
+    Every round sends to all targets concurrently through the dispatcher, and rounds are
+    started by the event loop timer, so the caller returns as soon as the broadcast is scheduled.
+    """
+
+    def __init__(self, interval: float = RESEND_INTERVAL) -> None:
+        """Initialize Broadcaster."""
+        self.interval = interval
+        self.tasks: Set[asyncio.Task[None]] = set()
+        self.rounds = metrics.counter("broadcast.rounds")
+        self.duration = metrics.latency("broadcast.round_duration")
+
+    def schedule(self, targets: List[BroadcastTarget], rounds: int) -> None:
+        loop = asyncio.get_running_loop()
+        for number in range(rounds):
+            loop.call_later(number * self.interval, self._start_round, targets)
+
+    def _start_round(self, targets: List[BroadcastTarget]) -> None:
+        task = asyncio.create_task(self._round(targets))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _round(self, targets: List[BroadcastTarget]) -> None:
+        started = time.monotonic()
+        results = await asyncio.gather(*(target.send() for target in targets), return_exceptions=True)
+        self.rounds.inc()
+        self.duration.observe(time.monotonic() - started)
+        for target, result in zip(targets, results):
+            if isinstance(result, BaseException):
+                LOGGER.error(f"Broadcast send failed: {result}")
+                continue
+            if result and target.on_sent:
+                await target.on_sent(result)
+
+
+DISPATCHER: OutboundDispatcher = OutboundDispatcher()
+BROADCASTER: Broadcaster = Broadcaster()
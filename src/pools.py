@@ -1,25 +1,38 @@
 import asyncio
+import base64
 import json
 import logging
+import random
+import sys
+import time
+from collections import Counter
 from dataclasses import dataclass
 from os import getenv
-from typing import Any, List, Optional, Tuple
+from typing import Any, Awaitable, Dict, List, Optional, Tuple, TypeVar, Union, cast
 
 from aiogram import Bot
 from aiogram.enums import ParseMode
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, URLInputFile
+from aiogram.types import BufferedInputFile, InlineKeyboardButton, InlineKeyboardMarkup, InputFile
 from aiohttp import ClientSession
 from dotenv import load_dotenv
-from solana.rpc.async_api import AsyncClient
-from solana.rpc.types import Commitment
 from solana.rpc.websocket_api import connect as ws_connect
 from solders.pubkey import Pubkey  # type: ignore
 from solders.rpc.config import RpcTransactionLogsFilterMentions  # type: ignore
-from solders.rpc.responses import GetTransactionResp  # type: ignore
+from solders.rpc.responses import (  # type: ignore
+    GetTokenLargestAccountsResp,
+    GetTokenSupplyResp,
+    GetTransactionResp,
+)
 from solders.signature import Signature  # type: ignore
+from solders.transaction import VersionedTransaction  # type: ignore
 from solders.transaction_status import UiPartiallyDecodedInstruction, UiTransaction  # type: ignore
 
+import metrics
+import mints
 import utils
+from db import Storage, create_storage
+from leases import Lease, LeaseManager
+from rpc import EndpointPool
 
 load_dotenv()
 
@@ -31,6 +44,29 @@ TOKEN: str = getenv("BOT_TOKEN", "")
 RAYDIUN_PROGRAM_ID: Pubkey = Pubkey.from_string("675kPX9MHTjS2zt1qfr1NYHuzeLXfQM9H24wFSUt1Mp8")
 SOL_MINT: Pubkey = Pubkey.from_string("So11111111111111111111111111111111111111112")
 PUMP_WALLET: Pubkey = Pubkey.from_string("39azUYFWPz3VHgKCf3VChUwbpURdCHRxjWVowf5jUJjg")
+POOLS_WORKERS: int = int(getenv("POOLS_WORKERS", "8"))
+POOLS_QUEUE_SIZE: int = int(getenv("POOLS_QUEUE_SIZE", "1000"))
+POOLS_SUBSCRIPTION: str = getenv("POOLS_SUBSCRIPTION", "migration")  # migration, raydium or both
+RECENT_SIGNATURES: int = 10_000
+TX_ENCODING: str = getenv("POOLS_TX_ENCODING", "base64")  # base64 or jsonParsed
+CHECKPOINT_NAME: str = "pools"
+MAX_BACKFILL: int = int(getenv("POOLS_MAX_BACKFILL", "1000"))  # signatures
+SIGNATURES_PAGE: int = 1000
+RECONNECT_BASE: float = 1.0  # seconds
+RECONNECT_MAX: float = 60.0  # seconds
+ENRICH_TIMEOUT: float = float(getenv("POOLS_ENRICH_TIMEOUT", "3"))  # seconds per lookup
+IMAGE_TIMEOUT: float = float(getenv("POOLS_IMAGE_TIMEOUT", "3"))  # seconds
+IMAGE_MAX_BYTES: int = int(getenv("POOLS_IMAGE_MAX_BYTES", str(5 * 1024 * 1024)))
+LEASE_NAME: str = "pools"
+IMAGE_CACHE_SIZE: int = 5_000
+DEFAULT_TOPIC_ID: int = 35117
+
+T = TypeVar("T")
+SUBSCRIPTION_FILTERS: Dict[str, List[Pubkey]] = {
+    "migration": [PUMP_WALLET],
+    "raydium": [RAYDIUN_PROGRAM_ID],
+    "both": [PUMP_WALLET, RAYDIUN_PROGRAM_ID],
+}
 
 
 @dataclass
@@ -62,47 +98,131 @@ class AssetData:
     website: Optional[str]
     pump: Optional[str]
     dex: str
+    image: Optional[bytes] = None
+
+
+@dataclass
+class PoolSubscription:
+    chat_id: int
+    topic_id: Optional[int] = None
+    min_top_holders_allocation: int = 0
+    require_socials: bool = False
+
+    def matches(self, asset_info: AssetData) -> bool:
+        if asset_info.top_holders_allocation < self.min_top_holders_allocation:
+            return False
+        if self.require_socials and not (asset_info.twitter or asset_info.telegram or asset_info.website):
+            return False
+        return True
+
+    def to_doc(self) -> dict:
+        return {
+            "chatId": self.chat_id,
+            "topicId": self.topic_id,
+            "minTopHoldersAllocation": self.min_top_holders_allocation,
+            "requireSocials": self.require_socials,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "PoolSubscription":
+        return cls(
+            chat_id=int(doc["chatId"]),
+            topic_id=int(doc["topicId"]) if doc.get("topicId") is not None else None,
+            min_top_holders_allocation=int(doc.get("minTopHoldersAllocation", 0)),
+            require_socials=bool(doc.get("requireSocials", False)),
+        )
+
+
+@dataclass
+class PendingLog:
+    signature: Signature
+    slot: int
+    received: float
+    raw: Optional[dict] = None  # the base64 transaction, when it was already fetched
+
+
+def is_migration_log(err: Any, logs: Optional[List[str]]) -> bool:
+    return not err and any("initialize2" in line for line in logs or [])
 
 
 class NewPoolsScrapper:
-    def __init__(self, rpc: str, bot: Bot) -> None:
+    def __init__(self, rpc: str, bot: Bot, db: Storage, leases: Optional[LeaseManager] = None) -> None:
         """Initialize New Pools scrapper."""
         self.rpc = rpc
+        self.db = db
+        self.leases = leases or LeaseManager(db)
+        self.hosts = [host.strip() for host in rpc.split(",") if host.strip()]
         self.task: Optional[asyncio.Task[Any]] = None
-        self.topic_id = 35117
+        self.lease: Optional[Lease] = None
+        self.registry = asyncio.Lock()  # serializes start/stop with sync, so a stale snapshot cannot win
         self.bot = bot
-        self.chat_id: Optional[int] = None
+        self.subscriptions: Dict[int, PoolSubscription] = {}
+        self.image_file_ids: utils.LRUCache[str] = utils.LRUCache(IMAGE_CACHE_SIZE)
+        self.latest_slot = 0
+        self.checkpoint_slot = 0
+        self.backfill: Optional[asyncio.Task[None]] = None
+        self.in_flight: Counter[int] = Counter()
+        self.seen_signatures = utils.RecentSet(RECENT_SIGNATURES)
+        self.logs_received = metrics.counter("pools.logs_received")
+        self.candidates = metrics.counter("pools.candidates")
+        self.duplicates = metrics.counter("pools.duplicate_signatures")
+        self.backfilled = metrics.counter("pools.backfilled_signatures")
+        self.dropped = metrics.counter("pools.dropped_logs")
+        self.slot_received = metrics.gauge("pools.slot_received")
+        self.slot_processed = metrics.gauge("pools.slot_processed")
+        self.slot_lag = metrics.gauge("pools.slot_lag")
+        self.queue_wait = metrics.latency("pools.stage.queue_wait")
+        self.tx_latency = metrics.latency("pools.stage.tx")
+        self.enrich_latency = metrics.latency("pools.stage.enrich")
+        self.post_latency = metrics.latency("pools.stage.post")
+        self.alert_latency = metrics.latency("pools.alert")
+
+    async def sync(self) -> None:
+        """Reload the subscriptions shared by all replicas; whichever holds the lease runs the listener."""
+        async with self.registry:
+            self.subscriptions = {
+                subscription.chat_id: subscription
+                for subscription in map(PoolSubscription.from_doc, await self.db.get_pool_subscriptions())
+            }
+            if self.subscriptions:
+                self.leases.register(LEASE_NAME, self._run)
+            else:
+                await self.leases.drop(LEASE_NAME)
+
+    async def start(self, subscription: PoolSubscription) -> None:
+        """Register a chat for pool alerts; every subscriber shares one upstream subscription."""
+        async with self.registry:
+            updated = subscription.chat_id in self.subscriptions
+            self.subscriptions[subscription.chat_id] = subscription
+            await self.db.save_pool_subscription(subscription.to_doc())
+            if updated:
+                await self.bot.send_message(subscription.chat_id, "New Pools subscription updated.")
+            else:
+                await self.bot.send_message(subscription.chat_id, "Starting New Pools scrapper...")
+            await self.leases.claim(LEASE_NAME, self._run)
+
+    async def stop(self, chat_id: int) -> None:
+        async with self.registry:
+            if chat_id not in self.subscriptions:
+                await self.bot.send_message(chat_id, "New Pools scrapper is not running.")
+                return
 
-    async def start(self, chat_id: int) -> None:
-        if self.task:
-            await self.bot.send_message(chat_id, "Pool scrapper already running.")
-            return
+            await self.bot.send_message(chat_id, "Stopping New Pools scrapper...")
+            del self.subscriptions[chat_id]
+            await self.db.delete_pool_subscription(chat_id)
+            if not self.subscriptions:
+                await self.leases.drop(LEASE_NAME)
+                LOGGER.info("New Pools Task was successfully cancelled.")
 
+    async def _run(self, lease: Lease) -> None:
+        self.task = asyncio.current_task()
+        self.lease = lease
+        LOGGER.info(f"Running New Pools scrapper with lease token {lease.token}")
         try:
-            await self.bot.send_message(chat_id, "Starting New Pools scrapper...")
-            task = asyncio.create_task(self._get_new_pools())
-            self.task = task
-            self.chat_id = chat_id
-            await task
-        except asyncio.CancelledError:
-            LOGGER.info("New Pools Task was cancelled.")
-
-    async def stop(self) -> None:
-        if self.task and self.chat_id:
-            await self.bot.send_message(self.chat_id, "Stopping New Pools scrapper...")
-            self.task.cancel()
-
-            try:
-                await self.task
-            except asyncio.CancelledError:
-                LOGGER.info("New Pools Task was successfully cancelled.")
-            finally:
-                self.task = None
-                self.chat_id = None
-        else:
-            if not self.chat_id:
-                return
-            await self.bot.send_message(self.chat_id, "New Pools scrapper is not running.")
+            await self._get_new_pools()
+        finally:
+            self.task = None
+            self.lease = None
 
     def _compress_dev_link(self, dev: str) -> str:
         compressed_string = dev[:4] + "\.\.\." + dev[-4:]
@@ -110,8 +230,12 @@ class NewPoolsScrapper:
         return profile_link
 
     async def _post_new_pool(self, asset_info: AssetData) -> None:
-        if not self.task or not self.bot or not self.chat_id:
-            LOGGER.error("Task not initialized")
+        mints.MINT_INDEX.mark_migrated(asset_info.ca)
+        subscribers = [subscription for subscription in self.subscriptions.values() if subscription.matches(asset_info)]
+        if not self.task or not subscribers:
+            return
+        if self.lease and not await self.leases.fenced(self.lease):
+            LOGGER.warning(f"Pools lease lost, not posting {asset_info.ca} in case another replica took over")
             return
 
         keyboard_buttons: List[List[InlineKeyboardButton]] = []
@@ -130,7 +254,14 @@ class NewPoolsScrapper:
         result = " \| ".join(allocation_strings)
         payload += result
         payload += f"\n*🏦 Top 20 Hodlers allocation:* {asset_info.top_holders_allocation}%\n"
-        payload += f"\n*⏰ Fill time: *{utils.calculate_timespan(int(asset_info.fill_time))}"
+        if asset_info.fill_time.isdigit():
+            payload += f"\n*⏰ Fill time: *{utils.calculate_timespan(int(asset_info.fill_time))}"
+        activity = mints.MINT_INDEX.get(asset_info.ca)
+        if activity and activity.mentions:
+            payload += (
+                f"\n*🐦 Shilled by {activity.user_count} users, top score {activity.top_score:.0f}* "
+                rf"\({len(activity.mentions)} tweets\)"
+            )
 
         if asset_info.twitter:
             top_buttons.append(
@@ -169,14 +300,40 @@ class NewPoolsScrapper:
         keyboard_buttons.append(top_buttons)
         keyboard_buttons.append(bottom_buttons)
         keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
-        image = URLInputFile(asset_info.img_url)
-        _ = await utils.send_photo(
+        if asset_info.image and asset_info.ca not in self.image_file_ids:
+            # Upload the image once; the remaining subscribers reuse the file_id Telegram returns
+            await self._send_new_pool(subscribers[0], asset_info, payload, keyboard)
+            subscribers = subscribers[1:]
+        await asyncio.gather(
+            *(self._send_new_pool(subscription, asset_info, payload, keyboard) for subscription in subscribers)
+        )
+
+    async def _send_new_pool(
+        self, subscription: PoolSubscription, asset_info: AssetData, payload: str, keyboard: InlineKeyboardMarkup
+    ) -> None:
+        photo: Optional[Union[InputFile, str]] = self.image_file_ids.get(asset_info.ca)
+        if photo is None and asset_info.image:
+            photo = BufferedInputFile(asset_info.image, filename=f"{asset_info.ca}.png")
+        if photo is not None:
+            message = await utils.send_photo(
+                self.bot,
+                subscription.chat_id,
+                photo,
+                payload,
+                subscription.topic_id,
+                keyboard,
+                parse_mode=ParseMode.MARKDOWN_V2,
+            )
+            if message and message.photo:
+                self.image_file_ids.put(asset_info.ca, message.photo[-1].file_id)
+                return
+            LOGGER.warning(f"Failed to post the image of {asset_info.ca}, falling back to text")
+        _ = await utils.send_message(
             self.bot,
-            self.chat_id,
-            image,
+            subscription.chat_id,
             payload,
-            self.topic_id,
-            keyboard,
+            subscription.topic_id,
+            keyboard=keyboard,
             parse_mode=ParseMode.MARKDOWN_V2,
         )
 
@@ -195,21 +352,11 @@ class NewPoolsScrapper:
                 return instruction
         return None
 
-    async def _get_asset(self, session: ClientSession, mint: Pubkey) -> Optional[dict]:
+    async def _get_asset(self, rpc: EndpointPool, mint: Pubkey) -> Optional[dict]:
         if not self.task:
             return None
-        headers = {"Content-Type": "application/json"}
-        payload = {
-            "jsonrpc": "2.0",
-            "id": "text",
-            "method": "getAsset",
-            "params": {"id": str(mint)},
-        }
-
         try:
-            async with session.post(f"https://{RPC}", headers=headers, data=json.dumps(payload)) as response:
-                data = await response.json()
-                return data["result"]
+            return await rpc.call("getAsset", {"id": str(mint)}, kind="das")
         except Exception as e:
             LOGGER.error(f"Error in _get_asset: {e}")
             return None
@@ -231,7 +378,7 @@ class NewPoolsScrapper:
                 await asyncio.sleep(1)
         return None
 
-    async def _get_tx_details(self, client: AsyncClient, sig: Signature) -> Optional[UiTransaction]:
+    async def _get_tx_details(self, rpc: EndpointPool, sig: Signature) -> Optional[UiTransaction]:
         if not self.task:
             return None
         tx_raw = GetTransactionResp(None)
@@ -239,7 +386,14 @@ class NewPoolsScrapper:
 
         try:
             while attempt < 10:
-                tx_raw = await client.get_transaction(sig, "jsonParsed", Commitment("confirmed"), 0)
+                tx_raw = await rpc.call_parsed(
+                    "getTransaction",
+                    [
+                        str(sig),
+                        {"encoding": "jsonParsed", "commitment": "confirmed", "maxSupportedTransactionVersion": 0},
+                    ],
+                    GetTransactionResp,
+                )
                 if tx_raw != GetTransactionResp(None):
                     break
                 else:
@@ -256,182 +410,524 @@ class NewPoolsScrapper:
             LOGGER.error(f"Error in _get_tx_details: {e}")
         return None
 
-    async def _process_log(self, client: AsyncClient, log: dict) -> Optional[Tuple[Pubkey, Pubkey]]:
-        if not self.task:
-            return None
-        value = log[0].result.value
-        if value.err:
+    def _prefilter(self, notification: Any) -> Optional[PendingLog]:
+        value = notification.result.value
+        if not is_migration_log(value.err, value.logs):
             return None
-        if any(init_log for init_log in value.logs if "initialize2" in init_log):
-            sig = value.signature
-            await asyncio.sleep(0.5)
-            tx = await self._get_tx_details(client, sig)
-            if not tx:
-                return None
-            LOGGER.info(f"Found the initilize new pool tx: {sig}")
-            init_instr = self._find_instruction_by_program_id(
-                tx,
-                RAYDIUN_PROGRAM_ID,
+        return PendingLog(value.signature, notification.result.context.slot, time.monotonic())
+
+    def _update_lag(self) -> None:
+        oldest = min(self.in_flight) if self.in_flight else self.latest_slot
+        self.slot_lag.set(self.latest_slot - oldest)
+
+    def _intake(self, queue: "asyncio.Queue[PendingLog]", notification: Any) -> None:
+        self.logs_received.inc()
+        slot = notification.result.context.slot
+        if slot > self.latest_slot:
+            self.latest_slot = slot
+            self.slot_received.set(slot)
+        pending = self._prefilter(notification)
+        if not pending or not self._admit(pending):
+            return
+        try:
+            queue.put_nowait(pending)
+        except asyncio.QueueFull:
+            self.dropped.inc()
+            self.seen_signatures.discard(pending.signature)
+            LOGGER.warning(f"Pools queue is full, dropping {pending.signature}")
+            return
+        self._track(pending)
+
+    def _admit(self, pending: PendingLog) -> bool:
+        if not self.seen_signatures.add(pending.signature):
+            self.duplicates.inc()
+            return False
+        self.candidates.inc()
+        return True
+
+    def _track(self, pending: PendingLog) -> None:
+        self.in_flight[pending.slot] += 1
+        self._update_lag()
+
+    async def _backfill(self, queue: "asyncio.Queue[PendingLog]", rpc: EndpointPool) -> None:
+        """Queue the migration wallet signatures missed since the last checkpoint."""
+        checkpoint = await self.db.get_checkpoint(CHECKPOINT_NAME)
+        if not checkpoint:
+            return
+        missed: List[dict] = []
+        before: Optional[str] = None
+        while len(missed) < MAX_BACKFILL:
+            config: Dict[str, Any] = {
+                "until": checkpoint["signature"],
+                "limit": SIGNATURES_PAGE,
+                "commitment": "confirmed",
+            }
+            if before:
+                config["before"] = before
+            page = await rpc.call("getSignaturesForAddress", [str(PUMP_WALLET), config])
+            if not page:
+                break
+            missed.extend(page)
+            before = page[-1]["signature"]
+            if len(page) < SIGNATURES_PAGE:
+                break
+
+        entries: List[dict] = []
+        signatures: List[Signature] = []
+        for entry in reversed(missed[:MAX_BACKFILL]):
+            signature = Signature.from_string(entry["signature"])
+            # Signatures the live stream already handled need no transaction fetch
+            if entry.get("err") or signature in self.seen_signatures:
+                continue
+            entries.append(entry)
+            signatures.append(signature)
+        # Signature listings carry no logs, so the transactions are fetched in one batched round and put
+        # through the same initialize2 check as live logs; candidates keep their transaction for the workers
+        raws = await asyncio.gather(*(self._get_raw_tx(rpc, signature) for signature in signatures))
+        candidates = [
+            PendingLog(signature, entry["slot"], time.monotonic(), raw)
+            for entry, signature, raw in zip(entries, signatures, raws)
+            if raw and is_migration_log((raw.get("meta") or {}).get("err"), (raw.get("meta") or {}).get("logMessages"))
+        ]
+        LOGGER.info(
+            f"Backfilling {len(candidates)} migrations out of {len(missed)} signatures "
+            f"since slot {int(checkpoint['slot'])}"
+        )
+        for pending in candidates:
+            if not self._admit(pending):
+                continue
+            self.backfilled.inc()
+            self._track(pending)
+            await queue.put(pending)
+
+    def _start_backfill(self, queue: "asyncio.Queue[PendingLog]", rpc: EndpointPool) -> None:
+        if self.backfill and not self.backfill.done():
+            return
+
+        async def backfill() -> None:
+            try:
+                await self._backfill(queue, rpc)
+            except Exception as e:
+                LOGGER.error(f"Error backfilling missed signatures: {e}")
+
+        self.backfill = asyncio.create_task(backfill())
+
+    async def _save_checkpoint(self, pending: PendingLog) -> None:
+        # Only move forward once nothing older is still waiting, so a restart never skips work
+        if self.in_flight and pending.slot > min(self.in_flight):
+            return
+        if pending.slot < self.checkpoint_slot:
+            return
+        self.checkpoint_slot = pending.slot
+        token = self.lease.token if self.lease else None
+        if not await self.db.set_checkpoint(CHECKPOINT_NAME, pending.slot, str(pending.signature), token):
+            LOGGER.warning(f"Pools checkpoint was moved under a newer lease than token {token}, leaving it")
+
+    def _decode_instruction_accounts(self, result: dict, target_program_id: Pubkey) -> Optional[List[Pubkey]]:
+        """Resolve the accounts of the first top-level instruction of a program in a base64 transaction.
+
+        Versioned transactions index into the static keys followed by the writable and then the
+        readonly addresses loaded from lookup tables, which the RPC reports in the meta.
+        """
+        message = VersionedTransaction.from_bytes(base64.b64decode(result["transaction"][0])).message
+        keys = list(message.account_keys)
+        loaded = (result.get("meta") or {}).get("loadedAddresses") or {}
+        keys.extend(Pubkey.from_string(key) for key in loaded.get("writable", []))
+        keys.extend(Pubkey.from_string(key) for key in loaded.get("readonly", []))
+        for instruction in message.instructions:
+            if keys[instruction.program_id_index] == target_program_id:
+                return [keys[index] for index in instruction.accounts]
+        return None
+
+    async def _get_raw_tx(self, rpc: EndpointPool, sig: Signature) -> Optional[dict]:
+        for _ in range(10):
+            result = await rpc.call(
+                "getTransaction",
+                [str(sig), {"encoding": "base64", "commitment": "confirmed", "maxSupportedTransactionVersion": 0}],
             )
-            if init_instr:
-                address_a = init_instr.accounts[8]
-                address_b = init_instr.accounts[9]
-                pair = init_instr.accounts[4]
-                LOGGER.info(f"FOUND new pair: Token A: {address_a} Token B: {address_b}")
-                if init_instr.accounts[17] != PUMP_WALLET:
-                    LOGGER.info("Not a pump wallet transaction")
+            if result:
+                return result
+            LOGGER.warning(f"Failed to get transaction {sig}, retrying...")
+            await asyncio.sleep(0.5)
+        return None
+
+    async def _get_instruction_accounts(
+        self, rpc: EndpointPool, sig: Signature, raw: Optional[dict] = None
+    ) -> Optional[List[Pubkey]]:
+        if TX_ENCODING == "base64" or raw:
+            try:
+                result = raw or await self._get_raw_tx(rpc, sig)
+                if not result:
                     return None
-                if address_a == SOL_MINT:
-                    return (address_b, pair)
-                elif address_b == SOL_MINT:
-                    return (address_a, pair)
+                return self._decode_instruction_accounts(result, RAYDIUN_PROGRAM_ID)
+            except Exception as e:
+                LOGGER.warning(f"Falling back to jsonParsed for {sig}: {e}")
+
+        tx = await self._get_tx_details(rpc, sig)
+        if not tx:
+            return None
+        init_instr = self._find_instruction_by_program_id(
+            tx,
+            RAYDIUN_PROGRAM_ID,
+        )
+        return init_instr.accounts if init_instr else None
+
+    async def _process_log(
+        self, rpc: EndpointPool, sig: Signature, raw: Optional[dict] = None
+    ) -> Optional[Tuple[Pubkey, Pubkey]]:
+        if not self.task:
+            return None
+        if not raw:
+            await asyncio.sleep(0.5)
+        accounts = await self._get_instruction_accounts(rpc, sig, raw)
+        if not accounts:
+            return None
+        LOGGER.info(f"Found the initilize new pool tx: {sig}")
+        address_a = accounts[8]
+        address_b = accounts[9]
+        pair = accounts[4]
+        LOGGER.info(f"FOUND new pair: Token A: {address_a} Token B: {address_b}")
+        if accounts[17] != PUMP_WALLET:
+            LOGGER.info("Not a pump wallet transaction")
+            return None
+        if address_a == SOL_MINT:
+            return (address_b, pair)
+        elif address_b == SOL_MINT:
+            return (address_a, pair)
         return None
 
+    async def _handle_pending(self, session: ClientSession, rpc: EndpointPool, pending: PendingLog) -> bool:
+        """Process a candidate signature, returning whether it was a pump.fun migration."""
+        self.queue_wait.observe(time.monotonic() - pending.received)
+
+        started = time.monotonic()
+        mint_pair = await self._process_log(rpc, pending.signature, pending.raw)
+        self.tx_latency.observe(time.monotonic() - started)
+        if not mint_pair:
+            return False
+
+        LOGGER.info(f"Found new pool: {str(mint_pair[0])}")
+        started = time.monotonic()
+        asset_info = await self._get_asset_info(session, rpc, mint_pair[0], mint_pair[1])
+        self.enrich_latency.observe(time.monotonic() - started)
+        if not asset_info:
+            return True
+
+        started = time.monotonic()
+        await self._post_new_pool(asset_info)
+        self.post_latency.observe(time.monotonic() - started)
+        self.alert_latency.observe(time.monotonic() - pending.received)
+        return True
+
+    async def _worker(self, session: ClientSession, rpc: EndpointPool, queue: "asyncio.Queue[PendingLog]") -> None:
+        while True:
+            pending = await queue.get()
+            migrated = False
+            try:
+                migrated = await self._handle_pending(session, rpc, pending)
+            except Exception as e:
+                LOGGER.error(f"Error processing a log: {e}")
+            finally:
+                self.in_flight[pending.slot] -= 1
+                if not self.in_flight[pending.slot]:
+                    del self.in_flight[pending.slot]
+                self.slot_processed.set(max(self.slot_processed.value, pending.slot))
+                self._update_lag()
+                queue.task_done()
+            if migrated:
+                try:
+                    await self._save_checkpoint(pending)
+                except Exception as e:
+                    LOGGER.error(f"Error saving the pools checkpoint: {e}")
+
     async def _get_new_pools(self) -> None:
         if not self.task:
             return
+        queue: asyncio.Queue[PendingLog] = asyncio.Queue(maxsize=POOLS_QUEUE_SIZE)
+        async with ClientSession() as session:
+            rpc = EndpointPool(session, self.hosts)
+            workers = [asyncio.create_task(self._worker(session, rpc, queue)) for _ in range(POOLS_WORKERS)]
+            workers.append(asyncio.create_task(rpc.probe_forever()))
+            try:
+                await self._listen(queue, rpc)
+            finally:
+                if self.backfill:
+                    workers.append(self.backfill)
+                    self.backfill = None
+                for worker in workers:
+                    worker.cancel()
+                await asyncio.gather(*workers, return_exceptions=True)
+                self.in_flight.clear()
+
+    async def _listen(self, queue: "asyncio.Queue[PendingLog]", rpc: EndpointPool) -> None:
         done = False
+        attempt = 0
         while not done:
-            async with ClientSession() as session:
-                async with AsyncClient(f"https://{self.rpc}") as client:
+            endpoint = rpc.pick("ws")
+            try:
+                started = time.monotonic()
+                async with ws_connect(f"wss://{endpoint.host}", ping_interval=60, ping_timeout=120) as websocket:
+                    sub_ids: List[int] = []
                     try:
-                        async with ws_connect(f"wss://{self.rpc}", ping_interval=60, ping_timeout=120) as websocket:
-                            sub_id = None
-                            try:
-                                await websocket.logs_subscribe(  # type: ignore
-                                    RpcTransactionLogsFilterMentions(RAYDIUN_PROGRAM_ID),
-                                    "confirmed",
-                                )
-                                LOGGER.info("Subscribed to logs. Waiting for messages...")
-                                first_resp = await websocket.recv()
-                                sub_id = first_resp[0].result  # type: ignore
-
-                                async for log in websocket:
-                                    try:
-                                        mint_pair = await self._process_log(client, log)
-                                        if mint_pair:
-                                            LOGGER.info(f"Found new pool: {str(mint_pair[0])}")
-                                            asset_info = await self._get_asset_info(
-                                                session,
-                                                client,
-                                                mint_pair[0],
-                                                mint_pair[1],
-                                            )
-                                            if asset_info:
-                                                await self._post_new_pool(asset_info)
-                                    except asyncio.CancelledError:
-                                        done = True
-                                        break
-                                    except Exception as e:
-                                        LOGGER.error(f"Error processing a log: {e}")
-                            except asyncio.CancelledError:
-                                done = True
-                            except Exception as e:
-                                LOGGER.error(f"Error in Program Logs Task: {e}")
-                            finally:
-                                if sub_id:
-                                    await websocket.logs_unsubscribe(sub_id)  # type: ignore
-                                    self.task = None
-                                LOGGER.info("Cleaned up resources.")
+                        for mention in SUBSCRIPTION_FILTERS[POOLS_SUBSCRIPTION]:
+                            await websocket.logs_subscribe(  # type: ignore
+                                RpcTransactionLogsFilterMentions(mention),
+                                "confirmed",
+                            )
+                            first_resp = await websocket.recv()
+                            sub_ids.append(first_resp[0].result)  # type: ignore
+                        endpoint.observe("ws", time.monotonic() - started)
+                        attempt = 0
+                        self._start_backfill(queue, rpc)
+                        LOGGER.info(
+                            f"Subscribed to {POOLS_SUBSCRIPTION} logs on {endpoint.name}. Waiting for messages..."
+                        )
+
+                        async for msg in websocket:
+                            for notification in msg:
+                                try:
+                                    self._intake(queue, notification)
+                                except Exception as e:
+                                    LOGGER.error(f"Error receiving a log: {e}")
                     except asyncio.CancelledError:
                         done = True
                     except Exception as e:
-                        LOGGER.error(f"Error establishing WebSocket connection: {e}")
+                        LOGGER.error(f"Error in Program Logs Task: {e}")
+                        endpoint.fail(time.monotonic())
+                    finally:
+                        for sub_id in sub_ids:
+                            await websocket.logs_unsubscribe(sub_id)  # type: ignore
+                        LOGGER.info("Cleaned up resources.")
+            except asyncio.CancelledError:
+                done = True
+            except Exception as e:
+                LOGGER.error(f"Error establishing WebSocket connection: {e}")
+                endpoint.fail(time.monotonic())
+
+            if not done:
+                attempt += 1
+                delay = random.uniform(0, min(RECONNECT_MAX, RECONNECT_BASE * 2**attempt))
+                LOGGER.info(f"Reconnecting to the logs stream in {delay:.1f}s")
+                await asyncio.sleep(delay)
 
     def _sort_holders(self, top_holders: List[Holder]) -> List[Holder]:
         return sorted(top_holders, key=lambda x: x.allocation, reverse=True)
 
-    async def _get_allocation_info(
+    async def _get_holders(self, rpc: EndpointPool, mint: Pubkey) -> List[Holder]:
+        total_supply, holders_raw = await asyncio.gather(
+            rpc.call_parsed("getTokenSupply", [str(mint)], GetTokenSupplyResp),
+            rpc.call_parsed("getTokenLargestAccounts", [str(mint)], GetTokenLargestAccountsResp),
+        )
+        return [
+            Holder(
+                address=str(holder_raw.address),
+                allocation=int(round(int(holder_raw.amount.amount) / int(total_supply.value.amount) * 100)),
+            )
+            for holder_raw in holders_raw.value
+        ]
+
+    def _get_allocation_info(
         self,
-        client: AsyncClient,
+        holders: List[Holder],
         mint: Pubkey,
         dev: Optional[Pubkey],
         bonding_curve: Optional[Pubkey],
     ) -> HoldersInfo:
-        info = HoldersInfo(top_holders=[], dev_allocation=0, top_holders_allocation=0)
-        if not self.task:
-            return info
-        try:
-            total_supply = await client.get_token_supply(mint)
-            holders_raw = await client.get_token_largest_accounts(mint)
-            for holder_raw in holders_raw.value:
-                info.top_holders.append(
-                    Holder(
-                        address=str(holder_raw.address),
-                        allocation=int(round(int(holder_raw.amount.amount) / int(total_supply.value.amount) * 100)),
-                    )
-                )
-            if dev:
-                dev_token = utils.get_token_wallet(dev, mint)
-                for holder in info.top_holders:
-                    if holder.address == str(dev_token):
-                        info.dev_allocation = holder.allocation
-                        break
-            if bonding_curve:
-                bonding_curve_token = utils.get_token_wallet(bonding_curve, mint)
-                pump_token = utils.get_token_wallet(PUMP_WALLET, mint)
-                info.top_holders = [
-                    holder
-                    for holder in info.top_holders
-                    if holder.address != str(bonding_curve_token) and holder.address != str(pump_token)
-                ]
-            info.top_holders_allocation = int(sum(holder.allocation for holder in info.top_holders))
-            return info
-        except Exception as e:
-            LOGGER.error(f"Error in get_allocation_info: {e}")
-            return info
+        info = HoldersInfo(top_holders=holders, dev_allocation=0, top_holders_allocation=0)
+        if dev:
+            dev_token = str(utils.get_token_wallet(dev, mint))
+            for holder in info.top_holders:
+                if holder.address == dev_token:
+                    info.dev_allocation = holder.allocation
+                    break
+        if bonding_curve:
+            excluded = {
+                str(utils.get_token_wallet(bonding_curve, mint)),
+                str(utils.get_token_wallet(PUMP_WALLET, mint)),
+            }
+            info.top_holders = [holder for holder in info.top_holders if holder.address not in excluded]
+        info.top_holders_allocation = int(sum(holder.allocation for holder in info.top_holders))
+        return info
 
     def _fix_link(self, url: str) -> str:
         cut_pos = url.rfind("/")
         return f"https://pump.mypinata.cloud/ipfs{url[cut_pos:]}"
 
+    async def _with_deadline(self, name: str, coro: Awaitable[T], timeout: float = ENRICH_TIMEOUT) -> Optional[T]:
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            LOGGER.warning(f"{name} lookup missed its {timeout}s deadline")
+            metrics.counter(f"pools.enrich_timeouts.{name}").inc()
+        except Exception as e:
+            LOGGER.error(f"Error in {name} lookup: {e}")
+        return None
+
+    async def _get_asset_metadata(
+        self, session: ClientSession, asset_lookup: "asyncio.Task[Optional[dict]]"
+    ) -> Optional[dict]:
+        asset = await asset_lookup
+        if not asset:
+            return None
+        return await self._with_deadline(
+            "metadata", self._get_token_uri_metadata(session, self._fix_link(asset["content"]["json_uri"]))
+        )
+
+    async def _download_image(self, session: ClientSession, url: str) -> Optional[bytes]:
+        async with session.get(url) as response:
+            if response.status != 200:
+                LOGGER.warning(f"Image download failed with status {response.status}: {url}")
+                return None
+            if response.content_length and response.content_length > IMAGE_MAX_BYTES:
+                LOGGER.warning(f"Image of {response.content_length} bytes is over the size cap: {url}")
+                return None
+            data = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                data += chunk
+                if len(data) > IMAGE_MAX_BYTES:
+                    LOGGER.warning(f"Image is over the size cap of {IMAGE_MAX_BYTES} bytes: {url}")
+                    return None
+            return bytes(data)
+
+    async def _get_image(
+        self, session: ClientSession, mint: Pubkey, metadata_lookup: "asyncio.Task[Optional[dict]]"
+    ) -> Optional[bytes]:
+        if str(mint) in self.image_file_ids:
+            return None
+        uri_meta = await metadata_lookup
+        if not uri_meta or not uri_meta.get("image"):
+            return None
+        return await self._with_deadline(
+            "image", self._download_image(session, self._fix_link(uri_meta["image"])), IMAGE_TIMEOUT
+        )
+
     async def _get_asset_info(
-        self, session: ClientSession, client: AsyncClient, mint: Pubkey, pair: Pubkey
+        self, session: ClientSession, rpc: EndpointPool, mint: Pubkey, pair: Pubkey
     ) -> Optional[AssetData]:
+        """Run the independent lookups of a new pool concurrently.
+
+        Every lookup has its own deadline; a lookup that misses it leaves its fields empty
+        instead of holding back the alert. The image is downloaded as soon as the metadata
+        arrives, unless Telegram already holds it for this mint.
+        """
         if not self.task:
             return None
-        asset = await self._get_asset(session, mint)
-        if asset:
-            uri_meta = await self._get_token_uri_metadata(session, self._fix_link(asset["content"]["json_uri"]))
-            if not uri_meta:
-                return None
+        asset_lookup = asyncio.create_task(self._with_deadline("asset", self._get_asset(rpc, mint)))
+        metadata_lookup = asyncio.create_task(self._get_asset_metadata(session, asset_lookup))
+        asset, uri_meta, image, token_info, holders = await asyncio.gather(
+            asset_lookup,
+            metadata_lookup,
+            self._get_image(session, mint, metadata_lookup),
+            self._with_deadline("token_info", utils.get_token_info(str(mint))),
+            self._with_deadline("holders", self._get_holders(rpc, mint)),
+        )
+        if not asset and not token_info:
+            return None
 
-            token_info = await utils.get_token_info(str(mint))
-            twitter = uri_meta.get("twitter", None)
-            telegram = uri_meta.get("telegram", None)
-            website = uri_meta.get("website", None)
-            img_url = uri_meta.get("image", None)
-            if token_info:
-                alloc_info = await self._get_allocation_info(client, mint, token_info.dev, token_info.bonding_curve)
-
-            return AssetData(
-                dev_wallet=(str(token_info.dev) if token_info else "Unknown"),
-                fill_time=(token_info.created_timestamp if token_info else "Unknown"),
-                dev_alloc=alloc_info.dev_allocation if alloc_info else 0,
-                top_holders=alloc_info.top_holders if alloc_info else [],
-                top_holders_allocation=(alloc_info.top_holders_allocation if alloc_info else 0),
-                ca=asset["id"],
-                name=asset["content"]["metadata"]["name"],
-                symbol=asset["content"]["metadata"]["symbol"],
-                twitter=twitter,
-                img_url="" if not img_url else self._fix_link(img_url),
-                telegram=telegram,
-                website=website,
-                pump=(f"https://pump.fun/{mint}"),
-                dex=f"https://dexscreener.com/solana/{pair}",
-            )
-        return None
+        metadata = asset["content"]["metadata"] if asset else {"name": token_info.symbol, "symbol": token_info.symbol}
+        uri_meta = uri_meta or {}
+        img_url = uri_meta.get("image", None)
+        alloc_info = self._get_allocation_info(
+            holders or [],
+            mint,
+            token_info.dev if token_info else None,
+            token_info.bonding_curve if token_info else None,
+        )
+
+        return AssetData(
+            dev_wallet=(str(token_info.dev) if token_info else "Unknown"),
+            fill_time=(token_info.created_timestamp if token_info else "Unknown"),
+            dev_alloc=alloc_info.dev_allocation,
+            top_holders=alloc_info.top_holders,
+            top_holders_allocation=alloc_info.top_holders_allocation,
+            ca=str(mint),
+            name=metadata["name"],
+            symbol=metadata["symbol"],
+            twitter=uri_meta.get("twitter", None),
+            img_url="" if not img_url else self._fix_link(img_url),
+            telegram=uri_meta.get("telegram", None),
+            website=uri_meta.get("website", None),
+            pump=(f"https://pump.fun/{mint}"),
+            dex=f"https://dexscreener.com/solana/{pair}",
+            image=image,
+        )
 
 
 async def test() -> None:
     bot = Bot(token=TOKEN)
-    processor = NewPoolsScrapper(RPC, bot)
+    db = create_storage()
+    await db.initialize()
+    processor = NewPoolsScrapper(RPC, bot, db)
     try:
-        await processor.start(1)
+        await processor.start(PoolSubscription(chat_id=1))
+        await processor.leases.run([processor.sync])
     except KeyboardInterrupt:
-        await processor.stop()
+        await processor.stop(1)
+
+
+async def benchmark_subscriptions(seconds: int = 60) -> None:
+    """Compare inbound traffic and transaction fetches of the Raydium and the migration subscriptions.
+
+    Both streams are sampled over the same window and every notification is replayed through
+    the pre-filter, so the candidate count equals the `get_transaction` calls each mode would pay.
+    """
+    stats = {mode: {"logs": 0, "bytes": 0, "candidates": 0} for mode in ("raydium", "migration")}
+    scrapper = NewPoolsScrapper(RPC, Bot(token=TOKEN), create_storage())
+
+    async def sample(mode: str) -> None:
+        async with ws_connect(f"wss://{RPC.split(',')[0]}") as websocket:
+            await websocket.logs_subscribe(  # type: ignore
+                RpcTransactionLogsFilterMentions(SUBSCRIPTION_FILTERS[mode][0]), "confirmed"
+            )
+            await websocket.recv()
+            async for msg in websocket:
+                for notification in cast(List[Any], msg):
+                    stats[mode]["logs"] += 1
+                    stats[mode]["bytes"] += len(notification.to_json())
+                    if scrapper._prefilter(notification):
+                        stats[mode]["candidates"] += 1
+
+    tasks = [asyncio.create_task(sample(mode)) for mode in stats]
+    await asyncio.sleep(seconds)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for mode, counts in stats.items():
+        print(f"{mode}: {counts['logs']} logs, {counts['bytes']} bytes, {counts['candidates']} get_transaction calls")
+
+
+async def benchmark_tx_decoding(signatures: List[str]) -> None:
+    """Compare payload size and parse time of the base64 and the jsonParsed transaction paths."""
+    scrapper = NewPoolsScrapper(RPC, Bot(token=TOKEN), create_storage())
+    async with ClientSession() as session:
+        for encoding in ("jsonParsed", "base64"):
+            total_bytes = 0
+            parse_time = 0.0
+            for sig in signatures:
+                params = [sig, {"encoding": encoding, "commitment": "confirmed", "maxSupportedTransactionVersion": 0}]
+                payload = {"jsonrpc": "2.0", "id": 1, "method": "getTransaction", "params": params}
+                async with session.post(f"https://{scrapper.hosts[0]}", json=payload) as response:
+                    body = await response.read()
+                total_bytes += len(body)
+
+                started = time.perf_counter()
+                if encoding == "base64":
+                    scrapper._decode_instruction_accounts(json.loads(body)["result"], RAYDIUN_PROGRAM_ID)
+                else:
+                    tx = cast(Any, GetTransactionResp.from_json(body.decode())).value.transaction.transaction
+                    next(ix for ix in tx.message.instructions if getattr(ix, "program_id", None) == RAYDIUN_PROGRAM_ID)
+                parse_time += time.perf_counter() - started
+            print(
+                f"{encoding}: {total_bytes / len(signatures):.0f} bytes/tx, "
+                f"{parse_time / len(signatures) * 1_000_000:.0f} us/tx parse"
+            )
 
 
 # Example usage
 if __name__ == "__main__":
-    asyncio.run(test())
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        asyncio.run(benchmark_subscriptions())
+    elif len(sys.argv) > 2 and sys.argv[1] == "bench-tx":
+        asyncio.run(benchmark_tx_decoding(sys.argv[2:]))
+    else:
+        asyncio.run(test())
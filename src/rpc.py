@@ -0,0 +1,224 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from os import getenv
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple, Type, TypeVar
+
+from aiohttp import ClientSession
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+BATCH_WINDOW: float = float(getenv("RPC_BATCH_WINDOW", "0.005"))  # seconds
+MAX_BATCH: int = int(getenv("RPC_MAX_BATCH", "50"))
+PROBE_INTERVAL: float = float(getenv("RPC_PROBE_INTERVAL", "10"))  # seconds
+ERROR_BUDGET: int = int(getenv("RPC_ERROR_BUDGET", "5"))  # errors per window before an endpoint is benched
+ERROR_WINDOW: float = 60.0  # seconds
+COOLDOWN: float = 30.0  # seconds an endpoint stays benched
+EWMA_ALPHA: float = 0.3
+
+R = TypeVar("R")
+
+
+class RPCError(Exception):
+    pass
+
+
+class JSONRPCClient(ABC):
+    @abstractmethod
+    async def request(self, method: str, params: Any, kind: str = "rpc") -> dict:
+        """Send a call and return its full JSON-RPC response object."""
+
+    async def call(self, method: str, params: Any, kind: str = "rpc") -> Any:
+        """Send a call and return its `result`, raising `RPCError` on an error response."""
+        response = await self.request(method, params, kind)
+        if "error" in response:
+            raise RPCError(f"{method} failed: {response['error']}")
+        return response.get("result")
+
+    async def call_parsed(self, method: str, params: Any, parser: Type[R], kind: str = "rpc") -> R:
+        """Send a call and parse its response into the given `solders` response type."""
+        response = await self.request(method, params, kind)
+        parsed = parser.from_json(json.dumps(response))  # type: ignore[attr-defined]
+        if not isinstance(parsed, parser):
+            raise RPCError(f"{method} failed: {parsed}")
+        return parsed
+
+
+class BatchRPC(JSONRPCClient):
+    """JSON-RPC client that coalesces the calls issued within a short window into one request.
+
+    Each caller awaits its own future, which is resolved from the response item carrying the
+    id of its request, so callers are unaware of the batching. A failed request is reported to
+    `on_failure` once, however many callers were waiting on it.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        url: str,
+        window: float = BATCH_WINDOW,
+        max_batch: int = MAX_BATCH,
+        on_failure: Optional[Callable[[float], None]] = None,
+    ):
+        """Initialize batching JSON-RPC client."""
+        self.session = session
+        self.url = url
+        self.on_failure = on_failure
+        self.window = window
+        self.max_batch = max_batch
+        self.ids = itertools.count(1)
+        self.pending: List[Tuple[dict, "asyncio.Future[dict]"]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.in_flight: Set["asyncio.Task[None]"] = set()
+        self.calls = metrics.counter("rpc.calls")
+        self.batches = metrics.counter("rpc.batches")
+        self.latency = metrics.latency("rpc.batch_latency")
+
+    async def request(self, method: str, params: Any, kind: str = "rpc") -> dict:
+        """Queue a call and return its full JSON-RPC response object."""
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[dict] = loop.create_future()
+        self.pending.append(({"jsonrpc": "2.0", "id": next(self.ids), "method": method, "params": params}, future))
+        self.calls.inc()
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif not self.flush_handle:
+            self.flush_handle = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self.flush_handle:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        task = asyncio.create_task(self._send(batch))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _send(self, batch: List[Tuple[dict, "asyncio.Future[dict]"]]) -> None:
+        self.batches.inc()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            async with self.session.post(self.url, json=[body for body, _ in batch]) as response:
+                data = await response.json(content_type=None)
+            self.latency.observe(loop.time() - started)
+            if not isinstance(data, list):
+                raise RPCError(f"Batch request failed: {data}")
+            responses = {item.get("id"): item for item in data}
+            for body, future in batch:
+                item = responses.get(body["id"])
+                if future.done():
+                    continue
+                if item is None:
+                    future.set_exception(RPCError(f"No response for {body['method']}"))
+                else:
+                    future.set_result(item)
+        except Exception as e:
+            LOGGER.error(f"Error in batch of {len(batch)} calls: {e}")
+            if self.on_failure:
+                self.on_failure(time.monotonic())
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+
+class Endpoint:
+    def __init__(self, host: str) -> None:
+        """Initialize endpoint health state."""
+        self.host = host
+        self.name = host.split("/")[0]  # never log API keys passed in the path or query
+        self.latency: Dict[str, float] = {}
+        self.errors: Deque[float] = deque()
+        self.down_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.down_until
+
+    def observe(self, kind: str, seconds: float) -> None:
+        previous = self.latency.get(kind)
+        self.latency[kind] = seconds if previous is None else EWMA_ALPHA * seconds + (1 - EWMA_ALPHA) * previous
+        metrics.gauge(f"rpc.endpoint.{self.name}.{kind}_ms").set(round(self.latency[kind] * 1000))
+
+    def fail(self, now: float) -> None:
+        metrics.counter(f"rpc.endpoint.{self.name}.errors").inc()
+        self.errors.append(now)
+        while self.errors and self.errors[0] < now - ERROR_WINDOW:
+            self.errors.popleft()
+        if len(self.errors) >= ERROR_BUDGET:
+            LOGGER.warning(f"RPC endpoint {self.name} exhausted its error budget, benching for {COOLDOWN}s")
+            self.down_until = now + COOLDOWN
+            self.errors.clear()
+
+    def score(self, kind: str) -> float:
+        return self.latency.get(kind, self.latency.get("rpc", float("inf")))
+
+
+class EndpointPool(JSONRPCClient):
+    """Route each request type to the fastest healthy endpoint and fail over on errors.
+
+    Latency is learned from a periodic `getHealth` probe and from real traffic, per request type
+    (`rpc`, `das`, `ws`), and every endpoint has its own error budget.
+    """
+
+    def __init__(self, session: ClientSession, hosts: List[str]) -> None:
+        """Initialize RPC endpoint pool."""
+        self.session = session
+        self.endpoints = [Endpoint(host) for host in hosts]
+        self.batchers = {
+            endpoint.host: BatchRPC(session, f"https://{endpoint.host}", on_failure=endpoint.fail)
+            for endpoint in self.endpoints
+        }
+
+    def ranked(self, kind: str = "rpc") -> List[Endpoint]:
+        now = time.monotonic()
+        healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=lambda e: e.score(kind))
+        if healthy:
+            return healthy
+        return sorted(self.endpoints, key=lambda e: e.down_until)
+
+    def pick(self, kind: str = "rpc") -> Endpoint:
+        return self.ranked(kind)[0]
+
+    async def request(self, method: str, params: Any, kind: str = "rpc") -> dict:
+        error: Optional[Exception] = None
+        for endpoint in self.ranked(kind):
+            started = time.monotonic()
+            try:
+                response = await self.batchers[endpoint.host].request(method, params, kind)
+                endpoint.observe(kind, time.monotonic() - started)
+                return response
+            except Exception as e:
+                # The endpoint was already charged once for the whole batch by its batcher
+                error = e
+                LOGGER.warning(f"{method} failed on {endpoint.name}, failing over: {e}")
+        raise RPCError(f"{method} failed on every endpoint: {error}")
+
+    async def probe(self) -> None:
+        for endpoint in self.endpoints:
+            started = time.monotonic()
+            try:
+                payload = {"jsonrpc": "2.0", "id": 1, "method": "getHealth"}
+                async with self.session.post(f"https://{endpoint.host}", json=payload) as response:
+                    data = await response.json(content_type=None)
+                if data.get("result") != "ok":
+                    raise RPCError(f"Unhealthy: {data.get('error')}")
+                endpoint.observe("rpc", time.monotonic() - started)
+            except Exception as e:
+                LOGGER.warning(f"Health probe failed on {endpoint.name}: {e}")
+                endpoint.fail(time.monotonic())
+
+    async def probe_forever(self, interval: float = PROBE_INTERVAL) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(interval)
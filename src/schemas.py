@@ -1,4 +1,4 @@
-from typing import Any, Dict, TypedDict
+from typing import Any, Dict, Optional, Tuple, TypedDict
 
 banned_schema: Dict[str, Dict[str, Any]] = {
     "xUserId": {"type": "string", "unique": True},
@@ -7,11 +7,58 @@ banned_schema: Dict[str, Dict[str, Any]] = {
 drops_schema: Dict[str, Dict[str, Any]] = {
     "xUserId": {"type": "string", "unique": True},
     "xUsername": {"type": "string"},
-    "score": {"type": "number"},
+    "score": {"type": "number", "index": True},
     "postIds": {"type": "list", "schema": {"type": "string"}},
     "messageIds": {"type": "list", "schema": {"type": "string"}},
 }
 
+checkpoints_schema: Dict[str, Dict[str, Any]] = {
+    "name": {"type": "string", "unique": True},
+    "slot": {"type": "number"},
+    "signature": {"type": "string"},
+    "token": {"type": "integer"},  # fencing token of the lease the last writer held
+}
+
+pool_subscriptions_schema: Dict[str, Dict[str, Any]] = {
+    "chatId": {"type": "integer", "unique": True},
+    "topicId": {"type": "integer"},
+    "minTopHoldersAllocation": {"type": "integer"},
+    "requireSocials": {"type": "boolean"},
+}
+
+mint_mentions_schema: Dict[str, Dict[str, Any]] = {
+    "mint": {"type": "string"},
+    "tweetId": {"type": "string"},
+    "xUserId": {"type": "string"},
+    "xUsername": {"type": "string"},
+    "score": {"type": "number"},
+    "timestamp": {"type": "integer", "index": True},
+}
+mint_mentions_key: Tuple[str, ...] = ("mint", "tweetId")  # a tweet mentions a mint at most once
+
+scrapper_tasks_schema: Dict[str, Dict[str, Any]] = {
+    "chatId": {"type": "integer", "unique": True},
+    "type": {"type": "string"},
+    "queries": {"type": "list", "schema": {"type": "string"}},
+    "topicIds": {"type": "dict"},
+    "digestWindows": {"type": "dict"},
+    "startedAt": {"type": "number"},
+}
+
+leases_schema: Dict[str, Dict[str, Any]] = {
+    "name": {"type": "string", "unique": True},
+    "owner": {"type": "string"},
+    "token": {"type": "integer"},
+    "expiresAt": {"type": "number"},
+}
+
+score_requests_schema: Dict[str, Dict[str, Any]] = {
+    "xUsername": {"type": "string", "unique": True},
+    "requestedAt": {"type": "number"},
+    "score": {"type": "number"},  # unset until the replica holding the scoring lease answers
+    "scoredAt": {"type": "number"},
+}
+
 
 class BannedSchema(TypedDict):
     x_user_id: str
@@ -23,3 +70,49 @@ class DropsSchema(TypedDict):
     x_score: int
     x_post_ids: list[str]
     message_ids: list[int]
+
+
+class CheckpointSchema(TypedDict):
+    name: str
+    slot: int
+    signature: str
+    token: int
+
+
+class PoolSubscriptionSchema(TypedDict):
+    chat_id: int
+    topic_id: Optional[int]
+    min_top_holders_allocation: int
+    require_socials: bool
+
+
+class MintMentionSchema(TypedDict):
+    mint: str
+    tweet_id: str
+    x_user_id: str
+    x_username: str
+    score: float
+    timestamp: int
+
+
+class ScrapperTaskSchema(TypedDict):
+    chat_id: int
+    type: str
+    queries: list[str]
+    topic_ids: Dict[str, int]
+    digest_windows: Dict[str, int]
+    started_at: float
+
+
+class LeaseSchema(TypedDict):
+    name: str
+    owner: str
+    token: int
+    expires_at: float
+
+
+class ScoreRequestSchema(TypedDict):
+    x_username: str
+    requested_at: float
+    score: Optional[float]
+    scored_at: float
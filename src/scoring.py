@@ -66,6 +66,7 @@ class Scrapper:
         self.username = USERNAME
         self.password = PASSWORD
         self.phone = PHONE
+        self.logged_in = False
         self.driver = self._init_driver()
 
     def _init_driver(self) -> webdriver.Firefox:
@@ -0,0 +1,100 @@
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Iterator, List, Optional, Pattern, Tuple
+
+BITS: int = 64
+MASK: int = (1 << BITS) - 1
+BANDS: int = 8  # near-duplicates within BANDS - 1 differing bits always share a band
+DISTANCE: int = 10  # differing bits still treated as the same text
+MIN_TOKENS: int = 4  # shorter texts are too generic to fingerprint
+WORD_PATTERN: Pattern[str] = re.compile(r"https?://\S+|@\w+|(\$?[^\W_]+)")
+
+
+def features(text: str) -> List[str]:
+    """Return the words of a text, ignoring case, links and mentions."""
+    words = [match.group(1) for match in WORD_PATTERN.finditer(text.lower()) if match.group(1)]
+    return words if len(words) >= MIN_TOKENS else []
+
+
+def fingerprint(text: str) -> Optional[int]:
+    tokens = features(text)
+    if not tokens:
+        return None
+    # Process-salted `hash` is fine here: fingerprints never leave the process
+    digests = [format(hash(token) & MASK, "064b") for token in tokens]
+    # A bit is set when most features have it set; columns are counted in C rather than bit by bit
+    majority = "".join("1" if column.count("1") * 2 > len(tokens) else "0" for column in zip(*digests))
+    return int(majority, 2)
+
+
+@dataclass
+class Cluster:
+    fingerprint: int
+    created: float
+    key: str = ""
+    similar: int = 0
+    data: Any = None
+
+
+class SimHashIndex:
+    """Streaming near-duplicate detector over a sliding time window.
+
+    Every text is reduced to a 64-bit SimHash and looked up in `BANDS` buckets keyed by a slice
+    of the fingerprint, so a lookup only compares against the few clusters sharing a slice.
+    Matches within `BANDS - 1` bits are always found, wider ones up to `distance` very likely.
+    Clusters expire `window` seconds after they were opened and at most `max_clusters` are kept.
+    Texts only match clusters opened with the same `key`, so a shill template reused for another
+    token, whose link the fingerprint ignores, is not taken for a duplicate.
+    """
+
+    def __init__(self, window: float = 600, max_clusters: int = 5_000, distance: int = DISTANCE) -> None:
+        """Initialize SimHashIndex."""
+        self.window = window
+        self.max_clusters = max_clusters
+        self.distance = distance
+        self.band_bits = BITS // BANDS
+        self.clusters: Deque[Cluster] = deque()
+        self.buckets: Dict[Tuple[str, int, int], List[Cluster]] = {}
+
+    def _bands(self, value: int, key: str) -> Iterator[Tuple[str, int, int]]:
+        mask = (1 << self.band_bits) - 1
+        for band in range(BANDS):
+            yield key, band, value >> (band * self.band_bits) & mask
+
+    def _evict(self, now: float) -> None:
+        while self.clusters and (
+            self.clusters[0].created < now - self.window or len(self.clusters) > self.max_clusters
+        ):
+            cluster = self.clusters.popleft()
+            for bucket_key in self._bands(cluster.fingerprint, cluster.key):
+                bucket = self.buckets[bucket_key]
+                bucket.remove(cluster)
+                if not bucket:
+                    del self.buckets[bucket_key]
+
+    def add(self, text: str, now: Optional[float] = None, key: str = "") -> Tuple[Optional[Cluster], bool]:
+        """Match a text against the open clusters sharing its key.
+
+        Returns the matching cluster with its `similar` counter bumped and True, or the newly
+        opened cluster and False. Texts too short to fingerprint return `(None, False)`.
+        """
+        value = fingerprint(text)
+        if value is None:
+            return None, False
+        now = time.monotonic() if now is None else now
+        self._evict(now)
+
+        for bucket in self._bands(value, key):
+            for cluster in self.buckets.get(bucket, []):
+                if (cluster.fingerprint ^ value).bit_count() <= self.distance:
+                    cluster.similar += 1
+                    return cluster, True
+
+        cluster = Cluster(value, now, key)
+        self.clusters.append(cluster)
+        for bucket in self._bands(value, key):
+            self.buckets.setdefault(bucket, []).append(cluster)
+        self._evict(now)
+        return cluster, False
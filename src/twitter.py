@@ -1,27 +1,50 @@
 import asyncio
+import json
 import logging
+import sys
 import time
-from dataclasses import dataclass
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
 from enum import Enum
 from os import getenv
-from typing import Any, Awaitable, Callable, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Coroutine, Dict, List, Optional, Set, Tuple, TypeVar
 
 import aiohttp
+import orjson
 from aiogram import Bot
-from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 from dotenv import load_dotenv
 
+import analyzer
+import metrics
+import mints
+import simhash
 import utils
-from db import MongoDB
+from db import Storage
+from leases import Lease, LeaseManager
+from outbound import BROADCASTER, DISPATCHER, BroadcastTarget, Priority
 from scoring import Scrapper
 
 load_dotenv()
 
+T = TypeVar("T")
 INTERVAL: int = 3  # seconds
+ENRICHMENT_TTL: int = 300  # seconds a shared tweet enrichment is kept for other chats
+SIMILAR_WINDOW: int = int(getenv("SIMILAR_WINDOW", "600"))  # seconds near-duplicate tweets are collapsed for
+SIMILAR_UPDATE_DELAY: int = 10  # seconds between "+N similar" edits of a collapsed post
+DIGEST_MAX_LENGTH: int = 3500  # characters, leaves headroom under Telegram's 4096 limit
+DIGEST_MAX_USERS: int = 10  # users listed per mint before "+N more"
+CATCHUP_WINDOW: int = int(getenv("TWITTER_CATCHUP_WINDOW", "600"))  # seconds of tweets replayed after a restart
+SCORING_LEASE: str = "scoring"  # only one replica drives the X account used for scoring
+SCORE_TIMEOUT: int = int(getenv("SCORE_TIMEOUT", "120"))  # seconds to wait for the scoring replica's answer
+SCORE_POLL_INTERVAL: float = 1.0  # seconds between score request checks
+CATCHUP_PAGES: int = int(getenv("TWITTER_CATCHUP_PAGES", "10"))  # search pages requested per poll at most
 LOGGER: logging.Logger = logging.getLogger(__name__)
 RESEND_TO: List[int] = [int(user) for user in getenv("RESEND_GROUP_IDS", "").split(",")]
 
 URL: str = "https://twitter154.p.rapidapi.com/search/search"
+CONTINUATION_URL: str = "https://twitter154.p.rapidapi.com/search/search/continuation"
 
 PUMP_QUERY: str = "'pump.fun' filter:links"
 
@@ -47,14 +70,111 @@ HEADERS_SECONDARY: Dict[str, str] = {
 }
 
 
-def determine_topic_id(follower_count: int, topic_ids: Dict[str, int]) -> int:
+@dataclass(slots=True)
+class TweetUser:
+    user_id: str
+    username: str
+    follower_count: int
+
+
+@dataclass(slots=True)
+class Tweet:
+    tweet_id: str
+    text: str
+    timestamp: int
+    in_reply_to_status_id: Optional[str]
+    user: TweetUser
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Tweet":
+        user = data["user"]
+        return cls(
+            tweet_id=data["tweet_id"],
+            text=data["text"],
+            timestamp=data["timestamp"],
+            in_reply_to_status_id=data.get("in_reply_to_status_id"),
+            user=TweetUser(user["user_id"], user["username"], user["follower_count"]),
+        )
+
+
+def parse_tweets(body: bytes) -> List[Tweet]:
+    """Decode a search response straight into `Tweet`s, dropping the fields we do not use."""
+    return parse_search(body)[0]
+
+
+def parse_search(body: bytes) -> Tuple[List[Tweet], Optional[str]]:
+    """Decode a search response into its `Tweet`s and the token of the next (older) page."""
+    data = orjson.loads(body)
+    return [Tweet.from_dict(tweet) for tweet in data.get("results") or []], data.get("continuation_token")
+
+
+@dataclass
+class Enrichment:
+    sanitized_text: str
+    analysis: analyzer.TextAnalysis
+    score: float
+    token_info: Optional[utils.TokenInfo]
+
+
+@dataclass
+class PostedTweet:
+    chat_id: int
+    message_id: int
+    payload: str
+    keyboard: InlineKeyboardMarkup
+    shown_similar: int = 0
+    update_scheduled: bool = False
+
+
+@dataclass
+class DigestEntry:
+    user_id: str
+    user_name: str
+    tweet_url: str
+    mint: Optional[str]
+    mc: float
+
+
+@dataclass
+class Digest:
+    chat_id: int
+    topic_id: int
+    entries: List[DigestEntry] = field(default_factory=list)
+
+
+def determine_tier(follower_count: int) -> str:
     if follower_count > 100_000:
-        topic_id = topic_ids["100"]
+        return "100"
     elif follower_count > 10_000:
-        topic_id = topic_ids["10"]
-    else:
-        topic_id = topic_ids["0"]
-    return topic_id
+        return "10"
+    return "0"
+
+
+def render_digest(entries: List[DigestEntry]) -> str:
+    """Render buffered tweets as one message, grouped by mint, busiest mint first."""
+    groups: Dict[Optional[str], List[DigestEntry]] = defaultdict(list)
+    for entry in entries:
+        groups[entry.mint].append(entry)
+
+    lines = [f"<b>- DIGEST: {len(entries)} TWEETS -</b>"]
+    ordered = sorted(groups.items(), key=lambda item: (item[0] is None, -len(item[1])))
+    for shown, (mint, group) in enumerate(ordered):
+        users = ", ".join(f"<a href='{entry.tweet_url}'>@{entry.user_name}</a>" for entry in group[:DIGEST_MAX_USERS])
+        if len(group) > DIGEST_MAX_USERS:
+            users += f" +{len(group) - DIGEST_MAX_USERS} more"
+        if mint:
+            mc = max(entry.mc for entry in group)
+            header = f"💊 <code>{mint}</code> · <b>{len(group)}</b> tweets" + (
+                f" · MC ${'{:,.0f}'.format(mc)}" if mc > 0.0 else ""
+            )
+        else:
+            header = f"🐦 <b>{len(group)}</b> tweets without a CA"
+        block = f"\n\n{header}\n{users}"
+        if sum(len(line) for line in lines) + len(block) > DIGEST_MAX_LENGTH:
+            lines.append(f"\n\n…and {len(ordered) - shown} more groups")
+            break
+        lines.append(block)
+    return "".join(lines)
 
 
 def determine_resend_number(score: float) -> int:
@@ -80,90 +200,224 @@ class ScrapperOptions:
     queries: List[str]
     type: ScrapperType
     topic_ids: Dict[str, int]
+    # Tier key ("0", "10", "100") -> seconds to buffer that tier's tweets into one digest message
+    digest_windows: Dict[str, int] = field(default_factory=dict)
+    started_at: float = 0.0  # when the chat started the task, tweets before it are never replayed
+
+    def to_doc(self, chat_id: int) -> dict:
+        return {
+            "chatId": chat_id,
+            "type": self.type.value,
+            "queries": self.queries,
+            "topicIds": self.topic_ids,
+            "digestWindows": self.digest_windows,
+            "startedAt": self.started_at,
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "ScrapperOptions":
+        return cls(
+            queries=list(doc["queries"]),
+            type=ScrapperType(doc["type"]),
+            topic_ids={key: int(value) for key, value in doc["topicIds"].items()},
+            digest_windows={key: int(value) for key, value in (doc.get("digestWindows") or {}).items()},
+            started_at=float(doc.get("startedAt") or 0.0),
+        )
 
 
 @dataclass
 class ScrapperTask:
     task: asyncio.Task
     options: ScrapperOptions
+    lease: Optional[Lease] = None
+
+
+def lease_name(chat_id: int, query: str) -> str:
+    """One lease per chat and query, also naming the search cursor it guards."""
+    return f"twitter:{chat_id}:{query}"
 
 
 class TwitterScrapper:
-    def __init__(self, bot: Bot, db: MongoDB, sc: Scrapper) -> None:
+    def __init__(self, bot: Bot, db: Storage, sc: Scrapper, leases: Optional[LeaseManager] = None) -> None:
         """Initialize Twitter Scrapper."""
         self.bot = bot
         self.db = db
         self.sc = sc
+        self.leases = leases or LeaseManager(db)
         self.tasks: dict[int, ScrapperTask] = {}
         self.lock = asyncio.Lock()
+        self.analyses: Dict[str, asyncio.Task[Tuple[str, analyzer.TextAnalysis]]] = {}
+        self.enrichments: Dict[str, asyncio.Task[Enrichment]] = {}
+        self.enrichment_hits = metrics.counter("twitter.enrichment.shared")
+        self.enrichment_misses = metrics.counter("twitter.enrichment.computed")
+        self.similar: Dict[int, simhash.SimHashIndex] = {}
+        self.similar_collapsed = metrics.counter("twitter.similar_collapsed")
+        self.score_timeouts = metrics.counter("twitter.score.timeouts")
+        self.background: Set[asyncio.Task[None]] = set()
+        self.digests: Dict[Tuple[int, int], Digest] = {}
+        self.scoring: Optional[Lease] = None
+        self.registry = asyncio.Lock()  # serializes start/stop with sync, so a stale sync cannot revive a stopped task
+
+    async def _registered(self, chat_id: int) -> Optional[ScrapperOptions]:
+        doc = next((doc for doc in await self.db.get_scrapper_tasks() if int(doc["chatId"]) == chat_id), None)
+        return ScrapperOptions.from_doc(doc) if doc else None
+
+    async def sync(self) -> None:
+        """Align the locally registered work with the cluster-wide registry of scrapper tasks."""
+        async with self.registry:
+            registered = {}
+            for doc in await self.db.get_scrapper_tasks():
+                options = ScrapperOptions.from_doc(doc)
+                registered[lease_name(int(doc["chatId"]), self._generate_query(options.queries))] = options
+            for name in self.leases.names("twitter:"):
+                if name not in registered:
+                    await self.leases.drop(name)
+            for name, options in registered.items():
+                self.leases.register(name, self._runner(int(name.split(":")[1]), options))
+
+    async def score(self, lease: Lease) -> None:
+        """Log the scoring account in and answer the score requests of every replica while the lease holds."""
+        if not self.sc.logged_in:
+            await asyncio.to_thread(self.sc.login)
+        self.scoring = lease
+        try:
+            while True:
+                for request in await self.db.get_pending_score_requests():
+                    username = request["xUsername"]
+                    await self.db.save_score(username, await self._calc_score(username))
+                await asyncio.sleep(SCORE_POLL_INTERVAL)
+        finally:
+            self.scoring = None
+
+    async def _calc_score(self, username: str) -> float:
+        LOGGER.info(f"Calculating score for {username}")
+        # Enter Critical Section
+        async with self.lock:
+            score = self.sc.calc_score(username)
+        LOGGER.info(f"Score for {username}: {score}")
+        return score
+
+    async def _score(self, user: TweetUser) -> float:
+        """Score a user here when this replica holds the scoring lease, otherwise through the replica that does."""
+        if self.scoring and self.scoring.held():
+            return await self._calc_score(user.username)
+        await self.db.request_score(user.username)
+        deadline = time.monotonic() + SCORE_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(SCORE_POLL_INTERVAL)
+            request = await self.db.get_score_request(user.username)
+            if request and request.get("score") is not None:
+                LOGGER.info(f"Score for {user.username} from the scoring replica: {request['score']}")
+                return float(request["score"])
+        self.score_timeouts.inc()
+        drop = await self.db.get_drop(user.user_id)
+        score = float(drop.get("score") or 0.0) if drop else 0.0
+        LOGGER.error(f"No replica scored {user.username} within {SCORE_TIMEOUT}s, using its last stored score {score}")
+        return score
 
     async def start(self, chat_id: int, options: ScrapperOptions) -> None:
-        if chat_id in self.tasks:
-            await self.bot.send_message(chat_id, "Scrapping is already running")
-            return
+        async with self.registry:
+            if await self._registered(chat_id):
+                await self.bot.send_message(chat_id, "Scrapping is already running")
+                return
 
-        if len(options.queries) == 0:
-            await self.bot.send_message(chat_id, "Something went wrong. Please try again.")
-            return
+            if len(options.queries) == 0:
+                await self.bot.send_message(chat_id, "Something went wrong. Please try again.")
+                return
 
-        async with aiohttp.ClientSession() as session:
-            task = asyncio.create_task(self._process_tweets(session, chat_id, options))
-            self.tasks[chat_id] = ScrapperTask(task, options)
-            try:
-                start_msg = "Starting Twitter scrapper"
-                await self.bot.send_message(chat_id, start_msg)
-                await task
-            except asyncio.CancelledError:
-                LOGGER.info(f"Cancelling Twitter Scrapper Task for chat_id {chat_id}")
+            # A fresh start only looks one minute back; catch-up is for replicas taking over a running task.
+            # The cursor itself is only ever written by the lease holder, under its fencing token.
+            options.started_at = time.time()
+            await self.db.save_scrapper_task(options.to_doc(chat_id))
+            start_msg = "Starting Twitter scrapper"
+            await self.bot.send_message(chat_id, start_msg)
+            name = lease_name(chat_id, self._generate_query(options.queries))
+            await self.leases.claim(name, self._runner(chat_id, options))
 
     async def stop(self, chat_id: int) -> Optional[ScrapperOptions]:
-        task_options = self.tasks.get(chat_id)
-        if task_options:
-            await self.bot.send_message(chat_id, "Stopping Twitter scrapper...")
-            task_options.task.cancel()
+        async with self.registry:
+            options = await self._registered(chat_id)
+            if options:
+                await self.bot.send_message(chat_id, "Stopping Twitter scrapper...")
+                await self.db.delete_scrapper_task(chat_id)
+                # Stops the task if it runs here; the replica owning it otherwise stops it on its next sync
+                await self.leases.drop(lease_name(chat_id, self._generate_query(options.queries)))
+                LOGGER.info(f"Task for chat_id {chat_id} was successfully cancelled")
+                return options
+            else:
+                await self.bot.send_message(chat_id, "Twitter scrapper is not running")
+                return None
+
+    def _runner(self, chat_id: int, options: ScrapperOptions) -> Callable[[Lease], Awaitable[None]]:
+        async def run(lease: Lease) -> None:
+            await self._run(chat_id, options, lease)
+
+        return run
+
+    async def _run(self, chat_id: int, options: ScrapperOptions, lease: Lease) -> None:
+        task = asyncio.current_task()
+        assert task
+        async with aiohttp.ClientSession() as session:
+            self.tasks[chat_id] = ScrapperTask(task, options, lease)
             try:
-                await task_options.task
+                LOGGER.info(f"Running Twitter scrapper for chat_id {chat_id} with lease token {lease.token}")
+                await self._process_tweets(session, chat_id, options)
             except asyncio.CancelledError:
-                LOGGER.info(f"Task for chat_id {chat_id} was successfully cancelled")
+                LOGGER.info(f"Cancelling Twitter Scrapper Task for chat_id {chat_id}")
+                raise
             finally:
                 del self.tasks[chat_id]
-            return task_options.options
-        else:
-            await self.bot.send_message(chat_id, "Twitter scrapper is not running")
-            return None
+                self.similar.pop(chat_id, None)
+                for key in [key for key in self.digests if key[0] == chat_id]:
+                    await self._flush_digest(key)
+
+    def _lease(self, chat_id: int) -> Optional[Lease]:
+        scrapper_task = self.tasks.get(chat_id)
+        return scrapper_task.lease if scrapper_task else None
+
+    async def _fenced(self, chat_id: int) -> bool:
+        """Whether this replica still owns the chat's task, confirmed against storage before posting."""
+        lease = self._lease(chat_id)
+        return lease is None or await self.leases.fenced(lease)
 
     async def _fetch_tweets(
         self,
         session: aiohttp.ClientSession,
-        process_func: Callable[[Dict, int, str, Dict[str, int]], Awaitable[None]],
+        process_func: Callable[[Tweet, int, str, Dict[str, int]], Awaitable[None]],
         query: str,
         chat_id: int,
         topic_ids: Dict[str, int],
         is_secondary: bool = False,
     ) -> None:
         global INTERVAL
+        cursor = lease_name(chat_id, query)
         latest_timestamp = int(time.time() - 60 * 1)
+        checkpoint = await self.db.get_checkpoint(cursor)
+        scrapper_task = self.tasks.get(chat_id)
+        started_at = int(scrapper_task.options.started_at - 60 * 1) if scrapper_task else 0
+        if checkpoint:
+            # Bounded catch-up: replay what was missed while down, but never more than CATCHUP_WINDOW
+            latest_timestamp = max(int(checkpoint["slot"]), int(time.time() - CATCHUP_WINDOW), started_at)
+        lease = self._lease(chat_id)
+        token = lease.token if lease else None
 
         while True:
+            if not await self._fenced(chat_id):
+                # Another replica may own the task by now: post nothing until the lease is renewed or lost
+                LOGGER.warning(f"Lease on chat_id {chat_id} is not confirmed, pausing until it is renewed")
+                await asyncio.sleep(INTERVAL)
+                continue
             try:
-                data = await self._fetch_tweets_data(session, query, is_secondary=is_secondary)
-
-                if not data or not data.get("results"):
-                    LOGGER.error("No results found.")
-                    continue
-
-                new_latest = data["results"][0]["timestamp"]
-
-                tasks = []
-                for tweet in data.get("results", []):
-                    if tweet["timestamp"] <= latest_timestamp:
-                        break
-                    tasks.append(process_func(tweet, chat_id, query, topic_ids))
-
-                if tasks:
-                    await asyncio.gather(*tasks)
-
-                latest_timestamp = new_latest
+                tweets = await self._fetch_new_tweets(session, query, latest_timestamp, is_secondary=is_secondary)
+
+                if tweets is None:
+                    LOGGER.error("Failed to fetch tweets, keeping the checkpoint.")
+                elif tweets:
+                    await asyncio.gather(*(process_func(tweet, chat_id, query, topic_ids) for tweet in tweets))
+                    newest = max(tweets, key=lambda tweet: tweet.timestamp)
+                    if not await self.db.set_checkpoint(cursor, newest.timestamp, newest.tweet_id, token):
+                        LOGGER.warning(f"Cursor {cursor} was moved under a newer lease than token {token}")
+                    latest_timestamp = newest.timestamp
             except Exception as e:
                 LOGGER.error(f"An error occurred: {e}")
 
@@ -171,7 +425,7 @@ class TwitterScrapper:
             await asyncio.sleep(INTERVAL)
 
     async def _process_tweets(self, session: aiohttp.ClientSession, chat_id: int, options: ScrapperOptions) -> None:
-        process_func: Optional[Callable[[Dict, int, str, Dict[str, int]], Awaitable[None]]] = None
+        process_func: Optional[Callable[[Tweet, int, str, Dict[str, int]], Awaitable[None]]] = None
         is_secondary = False
         if options.type == ScrapperType.PUMP:
             if {"100", "10", "0", "scores"} > options.topic_ids.keys():
@@ -195,15 +449,15 @@ class TwitterScrapper:
             is_secondary,
         )
 
-    async def _process_send_pump_tweet(self, tweet: Dict, chat_id: int, query: str, topic_ids: Dict[str, int]) -> None:
+    async def _process_send_pump_tweet(self, tweet: Tweet, chat_id: int, query: str, topic_ids: Dict[str, int]) -> None:
         if len(topic_ids) != 4:
             LOGGER.error("Invalid topic_ids for pump scrapper")
             return
 
-        user_id = tweet["user"]["user_id"]
-        user_name = tweet["user"]["username"]
-        tweet_id = tweet["tweet_id"]
-        follower_count = tweet["user"]["follower_count"]
+        user_id = tweet.user.user_id
+        user_name = tweet.user.username
+        tweet_id = tweet.tweet_id
+        follower_count = tweet.user.follower_count
 
         drop = await self.db.get_drop(user_id)
 
@@ -220,45 +474,146 @@ class TwitterScrapper:
             LOGGER.info(f"User {user_name} is banned")
             return
 
-        score = 0.0
+        # Collapsed right after the cheap analysis, so near-duplicates skip the token lookup and scoring.
+        # Keyed by the tokens the tweet points at: the same template shilling another mint is a new alert
+        _, analysis = await self._analyze(tweet)
+        mints_key = ",".join(sorted(set(analysis.pump_mints + analysis.addresses)))
+        similar = self.similar.setdefault(chat_id, simhash.SimHashIndex(SIMILAR_WINDOW))
+        cluster, duplicate = similar.add(tweet.text, key=mints_key)
+        if cluster and duplicate:
+            LOGGER.info(f"Tweet {tweet_id} is a near-duplicate of an earlier post, collapsing it")
+            self.similar_collapsed.inc()
+            self._schedule_similar_update(cluster)
+            return
+
+        enrichment = await self._enrich(tweet)
         if follower_count > 1000:
-            LOGGER.info(f"Calculating score for {user_name}. Query: {query}")
-            # Enter Critical Section
-            async with self.lock:
-                score = self.sc.calc_score(user_name)
-            LOGGER.info(f"Score for {user_name}: {score}")
-            await self.db.update_drop_score(user_id, score)
+            await self.db.update_drop_score(user_id, enrichment.score)
 
         LOGGER.info(f"New Tweet found: {tweet_id}. Query: {query}")
-        await self._send_pump_tweet(
+        posted = await self._send_pump_tweet(
             tweet,
             chat_id,
-            score,
+            enrichment,
             topic_ids,
         )
+        if cluster and posted:
+            cluster.data = posted
+            self._schedule_similar_update(cluster)
+
+    def _add_to_digest(self, chat_id: int, topic_id: int, window: int, entry: DigestEntry) -> None:
+        key = (chat_id, topic_id)
+        digest = self.digests.get(key)
+        if digest is None:
+            digest = self.digests[key] = Digest(chat_id, topic_id)
+            asyncio.get_running_loop().call_later(window, self._start_digest_flush, key)
+        digest.entries.append(entry)
+
+    def _start_digest_flush(self, key: Tuple[int, int]) -> None:
+        task = asyncio.create_task(self._flush_digest(key))
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def _flush_digest(self, key: Tuple[int, int]) -> None:
+        digest = self.digests.pop(key, None)
+        if not digest or not digest.entries:
+            return
+        LOGGER.info(f"Sending a digest of {len(digest.entries)} tweets to chat {digest.chat_id}")
+        msg = await utils.send_message(self.bot, digest.chat_id, render_digest(digest.entries), digest.topic_id)
+        if msg:
+            # Blocking any of the digested users deletes the digest along with their other posts
+            for user_id in {entry.user_id for entry in digest.entries}:
+                await self.db.update_drop_messages(user_id, msg.message_id)
+
+    def _schedule_similar_update(self, cluster: simhash.Cluster) -> None:
+        posted = cluster.data
+        if not isinstance(posted, PostedTweet) or posted.update_scheduled or not cluster.similar:
+            return
+        posted.update_scheduled = True
+        asyncio.get_running_loop().call_later(SIMILAR_UPDATE_DELAY, self._start_similar_update, cluster)
+
+    def _start_similar_update(self, cluster: simhash.Cluster) -> None:
+        task = asyncio.create_task(self._update_similar(cluster))
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def _update_similar(self, cluster: simhash.Cluster) -> None:
+        """Show how many near-duplicates were collapsed into a post by editing it."""
+        posted: PostedTweet = cluster.data
+        posted.update_scheduled = False
+        if cluster.similar == posted.shown_similar:
+            return
+        posted.shown_similar = cluster.similar
+        await DISPATCHER.submit(
+            posted.chat_id,
+            lambda: self.bot.edit_message_text(
+                text=f"{posted.payload.rstrip()}\n\n🔁 <b>+{cluster.similar} similar</b>",
+                chat_id=posted.chat_id,
+                message_id=posted.message_id,
+                reply_markup=posted.keyboard,
+                disable_web_page_preview=True,
+            ),
+        )
+
+    async def _analyze(self, tweet: Tweet) -> Tuple[str, analyzer.TextAnalysis]:
+        """Return the sanitized text and analysis of a tweet, the cheap first stage of its enrichment."""
+        return await self._shared(self.analyses, tweet.tweet_id, lambda: analyzer.analyze_tweet(tweet.text))
+
+    async def _enrich(self, tweet: Tweet) -> Enrichment:
+        """Return the enrichment of a tweet, computing it only for the first chat that receives it.
+
+        Later chats await the same task, so URL expansion, the token lookup and the scoring run
+        once per tweet however many scrappers match it.
+        """
+        return await self._shared(self.enrichments, tweet.tweet_id, lambda: self._compute_enrichment(tweet))
+
+    async def _shared(
+        self, tasks: Dict[str, "asyncio.Task[T]"], tweet_id: str, compute: Callable[[], Coroutine[Any, Any, T]]
+    ) -> T:
+        task = tasks.get(tweet_id)
+        if task is None:
+            self.enrichment_misses.inc()
+            task = asyncio.create_task(compute())
+            tasks[tweet_id] = task
+            task.add_done_callback(lambda done: self._expire_shared(tasks, tweet_id, done))
+        else:
+            self.enrichment_hits.inc()
+        # Shielded so a chat stopping its scrapper does not cancel the work other chats await
+        return await asyncio.shield(task)
+
+    def _expire_shared(self, tasks: Dict[str, Any], tweet_id: str, task: "asyncio.Task[Any]") -> None:
+        if task.cancelled() or task.exception():
+            tasks.pop(tweet_id, None)
+            return
+        asyncio.get_running_loop().call_later(ENRICHMENT_TTL, tasks.pop, tweet_id, None)
+
+    async def _compute_enrichment(self, tweet: Tweet) -> Enrichment:
+        user_name = tweet.user.username
+        sanitized_text, analysis = await self._analyze(tweet)
+        token_info = await utils.get_token_info(analysis.pump_mint) if analysis.pump_mint else None
+
+        score = await self._score(tweet.user) if tweet.user.follower_count > 1000 else 0.0
+        mention = mints.Mention(tweet.tweet_id, tweet.user.user_id, user_name, score, tweet.timestamp)
+        for mint in analysis.pump_mints + analysis.addresses:
+            mints.MINT_INDEX.add(mint, mention)
+        return Enrichment(sanitized_text, analysis, score, token_info)
 
     async def _process_send_ticker_tweet(
-        self, tweet: Dict, chat_id: int, query: str, topic_ids: Dict[str, int]
+        self, tweet: Tweet, chat_id: int, query: str, topic_ids: Dict[str, int]
     ) -> None:
         if len(topic_ids) != 3:
             LOGGER.error("Invalid topic_ids for ticker scrapper")
 
-        user_name = tweet["user"]["username"]
-        tweet_id = tweet["tweet_id"]
+        user_name = tweet.user.username
+        tweet_id = tweet.tweet_id
         tweet_url = f"https://twitter.com/{user_name}/status/{tweet_id}"
-        follower_count = tweet["user"]["follower_count"]
-        is_reply = tweet["in_reply_to_status_id"] is not None
-        sanitized_text = await utils.replace_short_urls(tweet["text"])
-        score = 0.0
+        follower_count = tweet.user.follower_count
+        is_reply = tweet.in_reply_to_status_id is not None
 
         LOGGER.info(f"New Tweet found: {tweet_id}. Query: {query}")
-
-        if follower_count > 1000:
-            LOGGER.info(f"Calculating score for {user_name}. Query: {query}")
-            # Enter Critical Section
-            async with self.lock:
-                score = self.sc.calc_score(user_name)
-            LOGGER.info(f"Score for {user_name}: {score}. Query: {query}")
+        enrichment = await self._enrich(tweet)
+        sanitized_text = enrichment.sanitized_text
+        score = enrichment.score
 
         keyboard_buttons = [
             [
@@ -283,6 +638,9 @@ class TwitterScrapper:
             f"<code>/raid {tweet_url}</code>"
         )
 
+        if not await self._fenced(chat_id):
+            LOGGER.warning(f"Lease on chat_id {chat_id} is not confirmed, not posting tweet {tweet_id}")
+            return
         if not is_reply:
             await utils.send_message(
                 self.bot,
@@ -306,23 +664,31 @@ class TwitterScrapper:
                 payload,
                 keyboard=keyboard,
                 topic_id=topic_ids["scores"],
+                priority=Priority.SCORES,
             )
 
     async def _send_pump_tweet(
         self,
-        tweet: Dict,
+        tweet: Tweet,
         chat_id: int,
-        score: float,
+        enrichment: Enrichment,
         topic_ids: Dict[str, int],
-    ) -> None:
-        user_id = tweet["user"]["user_id"]
-        user_name = tweet["user"]["username"]
-        tweet_id = tweet["tweet_id"]
-
-        topic_id = determine_topic_id(tweet["user"]["follower_count"], topic_ids)
-
-        sanitized_text = await utils.replace_short_urls(tweet["text"])
-        pump_url = utils.extract_url_and_validate_mint_address(sanitized_text)
+    ) -> Optional[PostedTweet]:
+        if not await self._fenced(chat_id):
+            LOGGER.warning(f"Lease on chat_id {chat_id} is not confirmed, not posting tweet {tweet.tweet_id}")
+            return None
+        user_id = tweet.user.user_id
+        user_name = tweet.user.username
+        tweet_id = tweet.tweet_id
+
+        tier = determine_tier(tweet.user.follower_count)
+        topic_id = topic_ids[tier]
+
+        sanitized_text = enrichment.sanitized_text
+        score = enrichment.score
+        pump_url = enrichment.analysis.pump_url
+        mint = enrichment.analysis.pump_mint
+        token_info = enrichment.token_info
         mc = 0.0
 
         keyboard_buttons = [
@@ -342,42 +708,52 @@ class TwitterScrapper:
             ],
         ]
 
-        mc = 0.0
-        if pump_url:
-            mint = utils.extract_mint_from_url(pump_url)
-            if mint:
-                token_info = await utils.get_token_info(mint)
-                if token_info:
-                    keyboard_buttons.append(
-                        [
-                            InlineKeyboardButton(text="💊 Pump", url=pump_url),
-                            InlineKeyboardButton(
-                                text="🐃 BullX",
-                                url=f"https://bullx.io/terminal?chainId=1399811149&address={mint}",
-                            ),
-                            InlineKeyboardButton(
-                                text="🛸 Photon",
-                                url=f"https://photon-sol.tinyastro.io/en/lp/{token_info.bonding_curve}",
-                            ),
-                        ]
-                    )
-                    mc = token_info.usd_market_cap
+        if pump_url and token_info:
+            keyboard_buttons.append(
+                [
+                    InlineKeyboardButton(text="💊 Pump", url=pump_url),
+                    InlineKeyboardButton(
+                        text="🐃 BullX",
+                        url=f"https://bullx.io/terminal?chainId=1399811149&address={mint}",
+                    ),
+                    InlineKeyboardButton(
+                        text="🛸 Photon",
+                        url=f"https://photon-sol.tinyastro.io/en/lp/{token_info.bonding_curve}",
+                    ),
+                ]
+            )
+            mc = token_info.usd_market_cap
 
         keyboard = InlineKeyboardMarkup(inline_keyboard=keyboard_buttons)
 
+        activity = mints.MINT_INDEX.get(mint) if mint else None
+        migrated = (
+            utils.calculate_timespan(int(activity.migrated_at * 1000)) if activity and activity.migrated_at else None
+        )
+
         payload = (
             f"<b>- NEW TWEET -</b>\n\n"
-            f"<blockquote>{await utils.replace_short_urls(tweet['text'])}</blockquote>\n\n"
+            f"<blockquote>{sanitized_text}</blockquote>\n\n"
             f"👤 @{user_name}\n"
-            f"👨‍👩‍👦‍👦 <b>Followers:</b> {tweet['user']['follower_count']}\n"
+            f"👨‍👩‍👦‍👦 <b>Followers:</b> {tweet.user.follower_count}\n"
             f"🪩 <b>Space Score:</b> {score}\n"
             + (f"🏛 <b>Market Cap:</b> ${'{:,.2f}'.format(mc)}\n" if mc > 0.0 else "")
+            + (f"🚀 <b>Migrated:</b> {migrated} ago\n" if migrated else "")
             + (f"☎️ <b>CA:</b> <code>{mint}</code>" if pump_url else "")
         )
 
-        msg = await utils.send_message(self.bot, chat_id, payload, topic_id, None, keyboard)
+        posted = None
+        task_options = self.tasks.get(chat_id)
+        digest_window = task_options.options.digest_windows.get(tier) if task_options else None
+        if digest_window:
+            tweet_url = f"https://twitter.com/{user_name}/status/{tweet_id}"
+            self._add_to_digest(chat_id, topic_id, digest_window, DigestEntry(user_id, user_name, tweet_url, mint, mc))
+            msg = None
+        else:
+            msg = await utils.send_message(self.bot, chat_id, payload, topic_id, None, keyboard)
         if msg:
-            await self.db.update_drop_messages(tweet["user"]["user_id"], msg.message_id)
+            await self.db.update_drop_messages(tweet.user.user_id, msg.message_id)
+            posted = PostedTweet(chat_id, msg.message_id, payload, keyboard)
 
         resend_number = determine_resend_number(score)
 
@@ -389,27 +765,42 @@ class TwitterScrapper:
                 topic_id=37874,
                 post_url=None,
                 keyboard=InlineKeyboardMarkup(inline_keyboard=keyboard_buttons),
+                priority=Priority.SCORES,
             )
 
         if resend_number == 0 or not pump_url:
-            return
+            return posted
 
-        resend_keyboard_buttons = keyboard_buttons.copy()
+        resend_keyboard_buttons = [row.copy() for row in keyboard_buttons]
         del resend_keyboard_buttons[0][-1]
+        resend_keyboard = InlineKeyboardMarkup(inline_keyboard=resend_keyboard_buttons)
 
-        for _ in range(resend_number):
-            msg = await utils.send_message(self.bot, chat_id, payload, post_url=None, keyboard=keyboard)
-            for resend_chat in RESEND_TO:
-                await utils.send_message(
+        async def store_message(msg: Message) -> None:
+            await self.db.update_drop_messages(user_id, msg.message_id)
+
+        targets = [
+            BroadcastTarget(
+                lambda: utils.send_message(
+                    self.bot, chat_id, payload, post_url=None, keyboard=keyboard, priority=Priority.RESEND
+                ),
+                store_message,
+            )
+        ]
+        targets.extend(
+            BroadcastTarget(
+                lambda resend_chat=resend_chat: utils.send_message(  # type: ignore[misc]
                     self.bot,
                     resend_chat,
                     payload,
                     post_url=None,
-                    keyboard=InlineKeyboardMarkup(inline_keyboard=resend_keyboard_buttons),
+                    keyboard=resend_keyboard,
+                    priority=Priority.RESEND,
                 )
-            if msg:
-                await self.db.update_drop_messages(tweet["user"]["user_id"], msg.message_id)
-            await asyncio.sleep(1)
+            )
+            for resend_chat in RESEND_TO
+        )
+        BROADCASTER.schedule(targets, resend_number)
+        return posted
 
     # async def _get_mentions_payload(self, chat_id: int) -> str:
     #     LOGGER.info(f"Getting mentions for chat_id {chat_id}")
@@ -420,21 +811,47 @@ class TwitterScrapper:
     #         )
     #     return "\u206c\u206f".join(notifies)
 
+    async def _fetch_new_tweets(
+        self, session: aiohttp.ClientSession, query: str, since: int, is_secondary: bool = False
+    ) -> Optional[List[Tweet]]:
+        """Page back through the search results until a tweet at or before `since` shows up.
+
+        Returns the newer tweets, newest first, or None when a page could not be fetched so the caller
+        keeps its checkpoint and retries the whole span. At most CATCHUP_PAGES pages are requested.
+        """
+        tweets: List[Tweet] = []
+        continuation: Optional[str] = None
+        for _ in range(CATCHUP_PAGES):
+            page = await self._fetch_tweets_data(session, query, is_secondary=is_secondary, continuation=continuation)
+            if page is None:
+                return None
+            results, continuation = page
+            tweets.extend(tweet for tweet in results if tweet.timestamp > since)
+            if not results or not continuation or min(tweet.timestamp for tweet in results) <= since:
+                return tweets
+        LOGGER.warning(f"Stopped paging after {CATCHUP_PAGES} pages before reaching {since}. Query: '{query}'")
+        return tweets
+
     async def _fetch_tweets_data(
-        self, session: aiohttp.ClientSession, query: str, is_secondary: bool = False
-    ) -> Optional[Dict]:
+        self,
+        session: aiohttp.ClientSession,
+        query: str,
+        is_secondary: bool = False,
+        continuation: Optional[str] = None,
+    ) -> Optional[Tuple[List[Tweet], Optional[str]]]:
         LOGGER.info(f"Fetching data. Query: '{query}'")
         try:
             params = FETCH_PARAMS.copy()
             params["query"] = query
+            if continuation:
+                params["continuation_token"] = continuation
 
             async with session.get(
-                URL,
+                CONTINUATION_URL if continuation else URL,
                 headers=HEADERS_SECONDARY if is_secondary else HEADERS_MAIN,
                 params=params,
             ) as response:
-                data = await response.json()
-                return data
+                return parse_search(await response.read())
         except Exception as e:
             LOGGER.error(f"Error fetching data: {e}")
             return None
@@ -443,3 +860,41 @@ class TwitterScrapper:
         if len(queries) == 1:
             return queries[0]
         return f"({' OR '.join(queries)})"
+
+
+async def _fetch_sample() -> bytes:
+    params = FETCH_PARAMS.copy()
+    params["query"] = PUMP_QUERY
+    async with aiohttp.ClientSession() as session:
+        async with session.get(URL, headers=HEADERS_MAIN, params=params) as response:
+            return await response.read()
+
+
+def benchmark_parsing(body: bytes, rounds: int = 100) -> None:
+    """Compare parse time and retained memory per tweet of the raw dict path and the `Tweet` model."""
+    count = len(parse_tweets(body))
+    if not count:
+        print("No tweets in the sample.")
+        return
+    paths: Dict[str, Callable[[], Any]] = {"dict": lambda: json.loads(body), "model": lambda: parse_tweets(body)}
+    for name, parse in paths.items():
+        started = time.perf_counter()
+        for _ in range(rounds):
+            parse()
+        elapsed = time.perf_counter() - started
+        tracemalloc.start()
+        result = parse()
+        retained, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        print(f"{name}: {elapsed / (rounds * count) * 1e6:.1f}us and {retained / count:.0f} bytes per tweet")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "bench-parse":
+        if len(sys.argv) > 2:
+            with open(sys.argv[2], "rb") as file:
+                sample = file.read()
+        else:
+            sample = asyncio.run(_fetch_sample())
+        benchmark_parsing(sample)
@@ -1,14 +1,14 @@
 import asyncio
 import logging
-import re
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, TypeVar, Union
 
 import aiohttp
 from aiogram import Bot
 from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramAPIError
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import (
     ChatMemberAdministrator,
     ForceReply,
@@ -22,45 +22,80 @@ from aiogram.types import (
 from solders.pubkey import Pubkey  # type: ignore
 from telethon import TelegramClient  # type: ignore
 
+import metrics
+from outbound import DISPATCHER, Priority
+
 LOGGER: logging.Logger = logging.getLogger(__name__)
 ASSOCIATED_TOKEN_PROGRAM_ID: Pubkey = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
 TOKEN_PROGRAM_ID: Pubkey = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+DELETE_CHUNK_SIZE: int = 100  # Bot API limit for deleteMessages
+TOKEN_WALLET_CACHE_SIZE: int = 10_000
 
+V = TypeVar("V")
 
-def is_valid_pubkey(pubkey: str) -> bool:
-    try:
-        Pubkey.from_string(pubkey)
+
+class RecentSet:
+    """Bounded set that forgets its oldest entries first."""
+
+    def __init__(self, maxsize: int) -> None:
+        """Initialize RecentSet."""
+        self.maxsize = maxsize
+        self.items: OrderedDict[Hashable, None] = OrderedDict()
+
+    def __contains__(self, item: Hashable) -> bool:
+        """Check membership without refreshing the item."""
+        return item in self.items
+
+    def add(self, item: Hashable) -> bool:
+        """Remember an item, returning False if it was already seen."""
+        if item in self.items:
+            self.items.move_to_end(item)
+            return False
+        self.items[item] = None
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
         return True
-    except Exception:
-        return False
 
+    def discard(self, item: Hashable) -> None:
+        self.items.pop(item, None)
 
-def extract_mint_from_url(url: str) -> Optional[str]:
-    mint_address = url.split("/")[-1]
 
-    if not is_valid_pubkey(mint_address):
-        return None
-    return mint_address
+class LRUCache(Generic[V]):
+    """Bounded mapping that evicts its least recently used entries first."""
 
+    def __init__(self, maxsize: int) -> None:
+        """Initialize LRUCache."""
+        self.maxsize = maxsize
+        self.items: OrderedDict[Hashable, V] = OrderedDict()
 
-def extract_url_and_validate_mint_address(text: str) -> Optional[str]:
-    url_pattern = re.compile(r"https:\/\/(www\.)?pump\.fun\/[A-Za-z0-9]+")
-    match = url_pattern.search(text)
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for a key without marking it as recently used."""
+        return key in self.items
 
-    if not match:
-        return None
+    def get(self, key: Hashable) -> Optional[V]:
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
 
-    url = match.group(0)
-    mint_address = url.split("/")[-1]
+    def put(self, key: Hashable, value: V) -> None:
+        self.items[key] = value
+        self.items.move_to_end(key)
+        if len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
 
-    if not is_valid_pubkey(mint_address):
-        return None
-    return url
+
+TOKEN_WALLET_CACHE: LRUCache[Pubkey] = LRUCache(TOKEN_WALLET_CACHE_SIZE)
+TOKEN_WALLET_HITS: metrics.Counter = metrics.counter("utils.token_wallet_cache.hits")
+TOKEN_WALLET_MISSES: metrics.Counter = metrics.counter("utils.token_wallet_cache.misses")
 
 
-def is_root_domain(url: str) -> bool:
-    root_domain_regex = re.compile(r"^https:\/\/[^\/]+\/?$")
-    return bool(root_domain_regex.match(url))
+def is_valid_pubkey(pubkey: str) -> bool:
+    try:
+        Pubkey.from_string(pubkey)
+        return True
+    except Exception:
+        return False
 
 
 async def expand_url(short_url: str) -> str:
@@ -73,32 +108,44 @@ async def expand_url(short_url: str) -> str:
         return short_url
 
 
-async def replace_short_urls(text: str) -> str:
-    url_regex = re.compile(r"(https?://t\.co/\S+?)([\.,!?]*)(?:\s|$)")
-
-    matches = url_regex.findall(text)
-    tasks = [expand_url(url) for url, _ in matches]
-    expanded_urls = await asyncio.gather(*tasks)
-
-    for (short_url, punctuation), expanded_url in zip(matches, expanded_urls):
-        text = text.replace(short_url, expanded_url + punctuation)
-
-    return text
-
+@dataclass
+class DeleteResult:
+    deleted: int
+    failed: int
 
-async def delete_message(bot: Bot, chat_id: int, messages: list[int]) -> bool:
-    attempts = 0
-    max_attempts = 3
 
-    while attempts < max_attempts:
-        try:
-            await bot.delete_messages(chat_id, messages)
+async def _delete_chunk(bot: Bot, chat_id: int, messages: List[int]) -> bool:
+    try:
+        return await bot.delete_messages(chat_id, messages)
+    except TelegramBadRequest as e:
+        # Messages that are already gone count as deleted
+        if "not found" in e.message:
             return True
-        except Exception as e:
-            LOGGER.error(f"Error deleting message: {e}")
-            attempts += 1
+        raise
+
 
-    return False
+async def delete_messages(
+    bot: Bot,
+    chat_id: int,
+    messages: List[int],
+    on_progress: Optional[Callable[[int, int], Awaitable[None]]] = None,
+) -> DeleteResult:
+    chunks = [messages[i : i + DELETE_CHUNK_SIZE] for i in range(0, len(messages), DELETE_CHUNK_SIZE)]
+    result = DeleteResult(deleted=0, failed=0)
+
+    async def delete(chunk: List[int]) -> None:
+        ok = await DISPATCHER.submit(
+            chat_id, lambda: _delete_chunk(bot, chat_id, chunk), Priority.ADMIN, per_chat=False
+        )
+        if ok:
+            result.deleted += len(chunk)
+        else:
+            result.failed += len(chunk)
+        if on_progress:
+            await on_progress(result.deleted + result.failed, len(messages))
+
+    await asyncio.gather(*(delete(chunk) for chunk in chunks))
+    return result
 
 
 async def send_message(
@@ -109,27 +156,21 @@ async def send_message(
     post_url: Optional[str] = None,
     keyboard: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, ForceReply]] = None,
     parse_mode: ParseMode = ParseMode.HTML,
+    priority: Priority = Priority.DEFAULT,
 ) -> Optional[Message]:
-    attempts = 0
-    max_attempts = 3
-
-    while attempts < max_attempts:
-        try:
-            msg = await bot.send_message(
-                chat_id=chat_id,
-                message_thread_id=topic_id,
-                text=payload,
-                parse_mode=parse_mode,
-                reply_markup=keyboard,
-                link_preview_options=((LinkPreviewOptions(url=post_url)) if post_url else None),
-                disable_web_page_preview=not bool(post_url),
-            )
-            return msg
-        except TelegramAPIError as e:
-            LOGGER.error(f"Failed to send message: {e}")
-            attempts += 1
-            await asyncio.sleep(1)
-    return None
+    return await DISPATCHER.submit(
+        chat_id,
+        lambda: bot.send_message(
+            chat_id=chat_id,
+            message_thread_id=topic_id,
+            text=payload,
+            parse_mode=parse_mode,
+            reply_markup=keyboard,
+            link_preview_options=((LinkPreviewOptions(url=post_url)) if post_url else None),
+            disable_web_page_preview=not bool(post_url),
+        ),
+        priority,
+    )
 
 
 async def send_photo(
@@ -140,26 +181,20 @@ async def send_photo(
     topic_id: Optional[int] = None,
     keyboard: Optional[Union[InlineKeyboardMarkup, ReplyKeyboardMarkup, ReplyKeyboardRemove, ForceReply]] = None,
     parse_mode: ParseMode = ParseMode.HTML,
+    priority: Priority = Priority.DEFAULT,
 ) -> Optional[Message]:
-    attempts = 0
-    max_attempts = 3
-
-    while attempts < max_attempts:
-        try:
-            msg = await bot.send_photo(
-                chat_id=chat_id,
-                message_thread_id=topic_id,
-                photo=photo,
-                caption=caption,
-                parse_mode=parse_mode,
-                reply_markup=keyboard,
-            )
-            return msg
-        except TelegramAPIError as e:
-            LOGGER.error(f"Failed to send photo: {e}")
-            attempts += 1
-            await asyncio.sleep(1)
-    return None
+    return await DISPATCHER.submit(
+        chat_id,
+        lambda: bot.send_photo(
+            chat_id=chat_id,
+            message_thread_id=topic_id,
+            photo=photo,
+            caption=caption,
+            parse_mode=parse_mode,
+            reply_markup=keyboard,
+        ),
+        priority,
+    )
 
 
 @dataclass
@@ -225,10 +260,19 @@ def calculate_timespan(timestamp: int) -> str:
 
 
 def get_token_wallet(owner: Pubkey, mint: Pubkey) -> Pubkey:
-    return Pubkey.find_program_address(
+    """Derive the associated token account of `owner` for `mint`, memoizing the PDA search."""
+    key = (owner, mint)
+    wallet = TOKEN_WALLET_CACHE.get(key)
+    if wallet is not None:
+        TOKEN_WALLET_HITS.inc()
+        return wallet
+    TOKEN_WALLET_MISSES.inc()
+    wallet = Pubkey.find_program_address(
         [bytes(owner), bytes(TOKEN_PROGRAM_ID), bytes(mint)],
         ASSOCIATED_TOKEN_PROGRAM_ID,
     )[0]
+    TOKEN_WALLET_CACHE.put(key, wallet)
+    return wallet
 
 
 async def setup_ticker_scrapper(bot: Bot, chat_id: int) -> Dict[str, int]:
@@ -281,14 +325,3 @@ async def run_ticker_handler_validate(message: Message, group_id: int, bot: Bot,
         return False
 
     return True
-
-
-def has_solscan_url(entities: List[Any] | None) -> bool:
-    if entities is None:
-        return False
-
-    for entity in entities:
-        if hasattr(entity, 'url') and 'solscan' in entity.url:
-            return True
-
-    return False
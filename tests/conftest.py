@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+# Read at import time by the bot modules
+os.environ.setdefault("RESEND_GROUP_IDS", "0")
+os.environ.setdefault("ALLOWED_USERS", "0")
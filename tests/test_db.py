@@ -0,0 +1,146 @@
+import asyncio
+import os
+import uuid
+from typing import Any, Awaitable, Iterator, TypeVar
+
+import pytest
+
+import db
+
+T = TypeVar("T")
+MONGO_TEST_URI = os.getenv("MONGO_TEST_URI", "")  # the Mongo cases run against a throwaway database there
+LOOP = asyncio.new_event_loop()
+
+
+def run(coro: Awaitable[T]) -> T:
+    return LOOP.run_until_complete(coro)
+
+
+@pytest.fixture(params=["sqlite", "mongo"])
+def storage(request: Any, tmp_path: Any, monkeypatch: Any) -> Iterator[db.Storage]:
+    if request.param == "sqlite":
+        backend: db.Storage = db.SQLiteDB(str(tmp_path / "test.db"))
+    else:
+        if not MONGO_TEST_URI:
+            pytest.skip("MONGO_TEST_URI is not set")
+        monkeypatch.setenv("MONGO_URI", MONGO_TEST_URI)
+        monkeypatch.setenv("COLLECTION_NAME", f"test_{uuid.uuid4().hex}")
+        backend = db.MongoDB()
+    run(backend.initialize())
+    yield backend
+    if isinstance(backend, db.MongoDB):
+        run(backend.client.drop_database(backend.COLLECTION_NAME))
+
+
+def test_drop_lifecycle(storage: db.Storage) -> None:
+    run(storage.insert_drop("1", "alice", "100"))
+    run(storage.update_drop_posts("1", "101"))
+    run(storage.update_drop_messages("1", 7))
+    run(storage.update_drop_score("1", 4.5))
+
+    drop = run(storage.get_drop("1"))
+    assert drop is not None
+    assert drop["xUsername"] == "alice"
+    assert drop["postIds"] == ["100", "101"]
+    assert drop["messageIds"] == [7]
+    assert drop["score"] == 4.5
+    assert run(storage.check_drop("1"))
+
+    run(storage.delete_drop("1"))
+    assert run(storage.get_drop("1")) is None
+    assert not run(storage.check_drop("1"))
+
+
+def test_banned(storage: db.Storage) -> None:
+    assert not run(storage.check_banned("1"))
+    run(storage.insert_banned("1"))
+    run(storage.insert_banned("1"))
+    assert run(storage.check_banned("1"))
+
+
+@pytest.mark.parametrize(
+    "condition, expected",
+    [
+        (None, ["a", "b", "c"]),
+        ({"score": {"$gt": 0.0}}, ["b", "c"]),
+        ({"score": {"$gte": 1.0, "$lt": 3.0}}, ["b"]),
+        ({"score": 3.0}, ["c"]),
+        ({"xUsername": {"$ne": "a"}}, ["b", "c"]),
+        ({"xUsername": {"$in": ["a", "c"]}}, ["a", "c"]),
+        ({"xUsername": {"$nin": ["a", "c"]}}, ["b"]),
+    ],
+)
+def test_get_drops_conditions(storage: db.Storage, condition: Any, expected: list) -> None:
+    for user_id, score in (("a", 0.0), ("b", 1.0), ("c", 3.0)):
+        run(storage.insert_drop(user_id, user_id, f"post-{user_id}"))
+        run(storage.update_drop_score(user_id, score))
+
+    drops = run(storage.get_drops(condition, {"_id": 0}))
+    assert sorted(drop["xUserId"] for drop in drops) == expected
+
+
+def test_get_drops_projection(storage: db.Storage) -> None:
+    run(storage.insert_drop("1", "alice", "100"))
+
+    drops = run(storage.get_drops(None, {"_id": 0, "messageIds": 0, "xUserId": 0}))
+    assert drops == [{"xUsername": "alice", "score": 0.0, "postIds": ["100"]}]
+
+
+def test_checkpoints(storage: db.Storage) -> None:
+    assert run(storage.get_checkpoint("pools")) is None
+    run(storage.set_checkpoint("pools", 10, "sig-1"))
+    run(storage.set_checkpoint("pools", 12, "sig-2"))
+
+    checkpoint = run(storage.get_checkpoint("pools"))
+    assert checkpoint is not None
+    assert (checkpoint["slot"], checkpoint["signature"]) == (12, "sig-2")
+
+
+def test_checkpoint_rejects_stale_fencing_token(storage: db.Storage) -> None:
+    assert run(storage.set_checkpoint("pools", 10, "sig-1", 1))
+    assert run(storage.set_checkpoint("pools", 12, "sig-2", 2))
+    assert not run(storage.set_checkpoint("pools", 14, "sig-3", 1))  # a replica whose lease was taken over
+
+    checkpoint = run(storage.get_checkpoint("pools"))
+    assert checkpoint is not None
+    assert (checkpoint["slot"], checkpoint["signature"], checkpoint["token"]) == (12, "sig-2", 2)
+
+
+def test_check_lease(storage: db.Storage) -> None:
+    token = run(storage.acquire_lease("pools", "a", 30))
+    assert token is not None
+    assert run(storage.check_lease("pools", "a", token))
+    assert not run(storage.check_lease("pools", "b", token))
+
+    run(storage.release_lease("pools", "a", token))
+    assert not run(storage.check_lease("pools", "a", token))
+    assert run(storage.acquire_lease("pools", "b", 30)) == token + 1
+
+
+def test_mint_mentions_upsert_on_mint_and_tweet(storage: db.Storage) -> None:
+    mention = {"mint": "M", "tweetId": "1", "xUserId": "u", "xUsername": "alice", "score": 1.0, "timestamp": 100}
+    run(storage.save_mint_mention(mention))
+    run(storage.save_mint_mention({**mention, "score": 2.0}))
+    run(storage.save_mint_mention({**mention, "mint": "N"}))
+    run(storage.save_mint_mention({**mention, "tweetId": "2", "timestamp": 50}))
+
+    mentions = run(storage.get_mint_mentions(100))
+    assert sorted((m["mint"], m["tweetId"], m["score"]) for m in mentions) == [("M", "1", 2.0), ("N", "1", 1.0)]
+
+    run(storage.delete_mint_mentions(100))
+    assert len(run(storage.get_mint_mentions(0))) == 2
+
+
+def test_score_requests(storage: db.Storage) -> None:
+    run(storage.request_score("alice"))
+    run(storage.request_score("bob"))
+    assert [request["xUsername"] for request in run(storage.get_pending_score_requests())] == ["alice", "bob"]
+
+    run(storage.save_score("alice", 2.5))
+    request = run(storage.get_score_request("alice"))
+    assert request is not None and request["score"] == 2.5
+    assert [request["xUsername"] for request in run(storage.get_pending_score_requests())] == ["bob"]
+
+    run(storage.request_score("alice"))  # asked again, the previous answer no longer counts
+    request = run(storage.get_score_request("alice"))
+    assert request is not None and request.get("score") is None
@@ -0,0 +1,108 @@
+import asyncio
+from typing import Any, Awaitable, List, TypeVar
+
+import db
+from leases import Lease, LeaseManager
+
+T = TypeVar("T")
+LOOP = asyncio.new_event_loop()
+
+
+def run(coro: Awaitable[T]) -> T:
+    return LOOP.run_until_complete(coro)
+
+
+def managers(tmp_path: Any, ttl: int = 30) -> List[LeaseManager]:
+    """Two replicas sharing one SQLite file, each through its own connection."""
+    result = []
+    for owner in ("a", "b"):
+        storage = db.SQLiteDB(str(tmp_path / "leases.db"))
+        run(storage.initialize())
+        result.append(LeaseManager(storage, owner=owner, ttl=ttl))
+    return result
+
+
+class Work:
+    def __init__(self, fail: int = 0) -> None:
+        """Initialize Work."""
+        self.leases: List[Lease] = []
+        self.fail = fail
+
+    async def __call__(self, lease: Lease) -> None:
+        """Record the lease, fail the first `fail` runs and block otherwise."""
+        self.leases.append(lease)
+        if len(self.leases) <= self.fail:
+            raise RuntimeError("boom")
+        await asyncio.Event().wait()
+
+
+def test_only_one_replica_wins_a_contended_lease(tmp_path: Any) -> None:
+    a, b = managers(tmp_path)
+    work_a, work_b = Work(), Work()
+
+    async def scenario() -> None:
+        assert await a.claim("pools", work_a)
+        assert not await b.claim("pools", work_b)
+        await b.tick()
+        await asyncio.sleep(0)
+        await a.drop("pools")
+
+    run(scenario())
+    assert len(work_a.leases) == 1
+    assert work_b.leases == []
+
+
+def test_expired_lease_is_taken_over_and_the_old_task_cancelled(tmp_path: Any) -> None:
+    a, b = managers(tmp_path, ttl=1)
+    work_a, work_b = Work(), Work()
+
+    async def scenario() -> None:
+        assert await a.claim("pools", work_a)
+        _, task = a.running["pools"]
+        await asyncio.sleep(1.1)  # a stalls past its TTL without a heartbeat
+        assert await b.claim("pools", work_b)
+        await a.tick()  # the renewal is refused, a stops its copy
+        await asyncio.wait([task])
+        assert task.cancelled()
+        assert "pools" not in a.running
+        assert not await a.db.check_lease("pools", "a", work_a.leases[0].token)
+        await b.drop("pools")
+
+    run(scenario())
+    assert work_b.leases[0].token == work_a.leases[0].token + 1
+
+
+def test_drop_releases_the_lease(tmp_path: Any) -> None:
+    a, b = managers(tmp_path)
+    work_a, work_b = Work(), Work()
+
+    async def scenario() -> None:
+        assert await a.claim("pools", work_a)
+        await a.drop("pools")  # cancelled before it even started
+        assert "pools" not in a.work
+        assert await b.claim("pools", work_b)  # free right away, no need to wait for the TTL
+        await asyncio.sleep(0)
+        await b.drop("pools")
+
+    run(scenario())
+    assert len(work_b.leases) == 1
+
+
+def test_failing_work_releases_its_lease_and_is_retried(tmp_path: Any) -> None:
+    a, _ = managers(tmp_path)
+    work = Work(fail=1)
+
+    async def scenario() -> None:
+        assert await a.claim("pools", work)
+        await asyncio.sleep(0.05)  # the first run raises
+        assert "pools" not in a.running
+        assert "pools" in a.work
+        assert not await a.db.check_lease("pools", "a", work.leases[0].token)
+        await a.tick()  # retried on the next heartbeat
+        await asyncio.sleep(0)
+        assert "pools" in a.running
+        await a.drop("pools")
+
+    run(scenario())
+    assert len(work.leases) == 2
+    assert work.leases[1].token == work.leases[0].token + 1
@@ -0,0 +1,35 @@
+import simhash
+
+TEMPLATE = "Next 100x gem just launched, dev doxxed and LP burned, aping now before it moons {link}"
+FIRST = "https://pump.fun/7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr"
+SECOND = "https://pump.fun/9BB6NFEcjBCtnNLFko2FqVQBq8HHM13kCyYcdQbgpump"
+
+
+def test_same_text_same_key_is_collapsed() -> None:
+    index = simhash.SimHashIndex()
+    cluster, duplicate = index.add(TEMPLATE.format(link=FIRST), now=0, key="mint-a")
+    assert cluster is not None and not duplicate
+
+    match, duplicate = index.add(TEMPLATE.format(link=FIRST), now=1, key="mint-a")
+    assert duplicate
+    assert match is cluster
+    assert cluster.similar == 1
+
+
+def test_same_text_different_mint_is_not_collapsed() -> None:
+    index = simhash.SimHashIndex()
+    first, _ = index.add(TEMPLATE.format(link=FIRST), now=0, key="mint-a")
+
+    second, duplicate = index.add(TEMPLATE.format(link=SECOND), now=1, key="mint-b")
+    assert not duplicate
+    assert second is not None and second is not first
+    assert first is not None and first.similar == 0
+
+
+def test_clusters_expire_after_the_window() -> None:
+    index = simhash.SimHashIndex(window=10)
+    index.add(TEMPLATE.format(link=FIRST), now=0, key="mint-a")
+
+    _, duplicate = index.add(TEMPLATE.format(link=FIRST), now=11, key="mint-a")
+    assert not duplicate
+    assert not any(cluster.created == 0 for cluster in index.clusters)
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Any, Awaitable, List, Optional, TypeVar
+
+import db
+import twitter
+from leases import Lease
+
+T = TypeVar("T")
+LOOP = asyncio.new_event_loop()
+TEMPLATE = "Next 100x gem just launched, dev doxxed and LP burned, aping now {mint}"
+MINT = "7GCihgDB8fe6KNjn2MYtkzZcRjQy3t9GHdC8uHYmW2hr"
+TOPIC_IDS = {"100": 1, "10": 2, "0": 3, "scores": 4}
+
+
+def run(coro: Awaitable[T]) -> T:
+    return LOOP.run_until_complete(coro)
+
+
+class FakeScorer:
+    def __init__(self) -> None:
+        """Initialize FakeScorer."""
+        self.logged_in = True
+        self.scored: List[str] = []
+
+    def calc_score(self, username: str) -> float:
+        self.scored.append(username)
+        return 1.0
+
+
+def tweet(tweet_id: str, user_id: str, text: str) -> twitter.Tweet:
+    user = twitter.TweetUser(user_id, f"user{user_id}", 5000)
+    return twitter.Tweet(tweet_id, text, int(time.time()), None, user)
+
+
+def test_near_duplicate_never_reaches_the_scorer(tmp_path: Any) -> None:
+    storage = db.SQLiteDB(str(tmp_path / "test.db"))
+    run(storage.initialize())
+    scorer = FakeScorer()
+    scrapper = twitter.TwitterScrapper(None, storage, scorer)  # type: ignore[arg-type]
+    scrapper.scoring = Lease(twitter.SCORING_LEASE, 1, time.monotonic() + 60)
+    sent: List[str] = []
+
+    async def send(tweet: twitter.Tweet, *args: Any) -> Optional[twitter.PostedTweet]:
+        sent.append(tweet.tweet_id)
+        return None
+
+    scrapper._send_pump_tweet = send  # type: ignore[method-assign]
+    run(scrapper._process_send_pump_tweet(tweet("1", "a", TEMPLATE.format(mint=MINT)), 7, "q", TOPIC_IDS))
+    run(scrapper._process_send_pump_tweet(tweet("2", "b", TEMPLATE.format(mint=MINT)), 7, "q", TOPIC_IDS))
+
+    assert sent == ["1"]
+    assert scorer.scored == ["usera"]
+
+
+def test_score_is_served_by_the_scoring_replica(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(twitter, "SCORE_POLL_INTERVAL", 0.01)
+    storage = db.SQLiteDB(str(tmp_path / "test.db"))
+    run(storage.initialize())
+    holder, other = FakeScorer(), FakeScorer()
+    scoring = twitter.TwitterScrapper(None, storage, holder)  # type: ignore[arg-type]
+    scrapper = twitter.TwitterScrapper(None, storage, other)  # type: ignore[arg-type]
+
+    async def scenario() -> float:
+        serving = asyncio.create_task(scoring.score(Lease(twitter.SCORING_LEASE, 1, time.monotonic() + 60)))
+        try:
+            return await scrapper._score(twitter.TweetUser("1", "alice", 5000))
+        finally:
+            serving.cancel()
+
+    assert run(scenario()) == 1.0
+    assert (holder.scored, other.scored) == (["alice"], [])
+
+
+def test_score_times_out_to_the_stored_score(tmp_path: Any, monkeypatch: Any) -> None:
+    monkeypatch.setattr(twitter, "SCORE_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(twitter, "SCORE_TIMEOUT", 0.05)
+    storage = db.SQLiteDB(str(tmp_path / "test.db"))
+    run(storage.initialize())
+    run(storage.insert_drop("1", "alice", "100"))
+    run(storage.update_drop_score("1", 3.0))
+    scrapper = twitter.TwitterScrapper(None, storage, FakeScorer())  # type: ignore[arg-type]
+    timeouts = scrapper.score_timeouts.value
+
+    assert run(scrapper._score(twitter.TweetUser("1", "alice", 5000))) == 3.0
+    assert scrapper.score_timeouts.value == timeouts + 1
+
+
+class FakeBot:
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> None:
+        pass
+
+
+def test_stale_sync_does_not_revive_a_stopped_task(tmp_path: Any) -> None:
+    storage = db.SQLiteDB(str(tmp_path / "test.db"))
+    run(storage.initialize())
+    options = twitter.ScrapperOptions(["$WIF"], twitter.ScrapperType.TOKEN, {"tweets": 1, "replies": 2, "scores": 3})
+    run(storage.save_scrapper_task(options.to_doc(7)))
+    scrapper = twitter.TwitterScrapper(FakeBot(), storage, FakeScorer())  # type: ignore[arg-type]
+    read = storage.get_scrapper_tasks
+
+    async def slow_read() -> list:
+        tasks = await read()
+        await asyncio.sleep(0.05)  # stop() runs while this snapshot is in flight
+        return tasks
+
+    async def scenario() -> None:
+        storage.get_scrapper_tasks = slow_read  # type: ignore[method-assign]
+        syncing = asyncio.create_task(scrapper.sync())
+        await asyncio.sleep(0)
+        storage.get_scrapper_tasks = read  # type: ignore[method-assign]
+        await scrapper.stop(7)
+        await syncing
+
+    run(scenario())
+    assert scrapper.leases.names("twitter:") == []